@@ -0,0 +1,85 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from fft_analysis_tab import process_frequency_data
+from signal_processing import ACCEL_COLUMNS, PRECISIONS, to_physical_units
+
+# Compares the float64 and float32 analysis paths: throughput and peak-frequency deviation.
+# Run from src/:  python benchmark_precision.py [csv files...] --repeats 5
+
+
+def load_channels(file_path, precision):
+    dtype = PRECISIONS[precision][0]
+    data = pd.read_csv(file_path, dtype={column: dtype for column in ACCEL_COLUMNS})
+    data = data.sort_values(by='Time [microseconds]')
+    data['Time [microseconds]'] -= data['Time [microseconds]'].min()
+    data = to_physical_units(data)
+    return [(sensor_id, sensor_data) for sensor_id, sensor_data in data.groupby('Accelerometer ID')]
+
+
+def synthetic_channels(n_samples, precision, fs=4000.0):
+    # Damped modes plus noise, quantised to ~12 bits like the ICM42688 output
+    rng = np.random.default_rng(0)
+    t = np.arange(n_samples) / fs
+    signal = np.zeros(n_samples)
+    for freq, decay in ((87.3, 3.0), (241.9, 5.0), (612.4, 8.0)):
+        signal += np.exp(-decay * t) * np.sin(2 * np.pi * freq * t)
+    signal += 0.01 * rng.standard_normal(n_samples)
+    signal = np.round(signal * 2048) / 2048
+    frame = pd.DataFrame({'Time [microseconds]': t * 1e6})
+    for column in ACCEL_COLUMNS:
+        frame[column] = signal.astype(PRECISIONS[precision][0])
+    return [("synthetic", frame)]
+
+
+def run(channels, precision, padding_factor, plot_mode, repeats):
+    results = []
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = []
+        for _, frame in channels:
+            for axis in ACCEL_COLUMNS:
+                results.extend(process_frequency_data([frame], axis, padding_factor, plot_mode,
+                                                      precision=precision))
+        best = min(best, time.perf_counter() - start)
+    samples = sum(len(frame) for _, frame in channels) * len(ACCEL_COLUMNS)
+    peaks = np.array([result['positive_freqs'][np.argmax(result['positive_magnitudes'])] for result in results],
+                     dtype=np.float64)
+    spacing = np.array([result['analysis_info']['bin_spacing_hz'] for result in results])
+    return best, samples, peaks, spacing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark float32 vs float64 spectral analysis.")
+    parser.add_argument("files", nargs="*", default=["../Samples/Samples_102124/Test 1/Test_1_HARD.csv"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--padding", type=int, default=5)
+    parser.add_argument("--mode", choices=["FFT", "PSD"], default="FFT")
+    parser.add_argument("--synthetic", type=int, default=2 ** 20, help="Samples in synthetic capture (0 to skip)")
+    args = parser.parse_args()
+
+    sources = [(path, lambda precision, path=path: load_channels(path, precision)) for path in args.files]
+    if args.synthetic:
+        sources.append((f"synthetic ({args.synthetic} samples)",
+                        lambda precision: synthetic_channels(args.synthetic, precision)))
+
+    print(f"{'Source':<50} {'f64 Msamp/s':>12} {'f32 Msamp/s':>12} {'Speedup':>8} "
+          f"{'Max peak dev (Hz)':>18} {'Bin (Hz)':>9}")
+    for name, loader in sources:
+        timings = {}
+        for precision in PRECISIONS:
+            channels = loader(precision)
+            timings[precision] = run(channels, precision, args.padding, args.mode, args.repeats)
+        t64, samples, peaks64, spacing = timings["float64"]
+        t32, _, peaks32, _ = timings["float32"]
+        deviation = np.max(np.abs(peaks64 - peaks32)) if len(peaks64) else float('nan')
+        print(f"{name[-50:]:<50} {samples / t64 / 1e6:>12.2f} {samples / t32 / 1e6:>12.2f} "
+              f"{t64 / t32:>7.2f}x {deviation:>18.4f} {np.max(spacing) if len(spacing) else 0:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from signal_processing import ACCEL_COLUMNS
+
+CONFIG_FILE_PATH = "../Preferences/config.json"
+CALIBRATION_KEY = "calibration"
+CALIBRATION_SECONDS = 3.0  # Live capture length for calibration
+QUIET_WINDOW_S = 1.0  # Length of the quiescent window the estimate is taken from
+# A still sensor must read about 1 g; further off than this the recording has no gravity in it
+# (high-passed at ingest) or the sensor was moving, and any estimate would be meaningless
+GRAVITY_TOLERANCE_G = 0.25
+
+
+def find_quiescent_window(time_values, accel_values, window_s=QUIET_WINDOW_S, time_scale=1e-6):
+    # Start/stop indices of the stillest `window_s` stretch: the window with the smallest
+    # summed per-axis variance, from cumulative sums so every window costs O(1).
+    time_values = np.asarray(time_values, dtype=np.float64)
+    accel_values = np.asarray(accel_values, dtype=np.float64).reshape(len(time_values), -1)
+    if len(time_values) < 3:
+        return None
+    dt = np.median(np.diff(time_values)) * time_scale
+    length = int(round(window_s / dt)) if dt > 0 else 0
+    if length < 2 or length > len(time_values):
+        return None
+    zero = np.zeros((1, accel_values.shape[1]))
+    sums = np.concatenate((zero, np.cumsum(accel_values, axis=0)))
+    squares = np.concatenate((zero, np.cumsum(accel_values ** 2, axis=0)))
+    window_sums = sums[length:] - sums[:-length]
+    window_squares = squares[length:] - squares[:-length]
+    variance = (window_squares - window_sums ** 2 / length).sum(axis=1) / length
+    start = int(np.argmin(variance))
+    return start, start + length
+
+
+def rotation_between(source, target):
+    # Rotation matrix turning unit vector `source` onto unit vector `target` (Rodrigues)
+    axis = np.cross(source, target)
+    sine, cosine = np.linalg.norm(axis), np.dot(source, target)
+    if sine < 1e-12:
+        if cosine > 0:
+            return np.eye(3)
+        # Opposite vectors: half turn about any perpendicular axis
+        perpendicular = np.eye(3)[np.argmin(np.abs(source))]
+        axis = np.cross(source, perpendicular)
+        axis /= np.linalg.norm(axis)
+        return 2 * np.outer(axis, axis) - np.eye(3)
+    skew = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+    return np.eye(3) + skew + skew @ skew * ((1 - cosine) / sine ** 2)
+
+
+def estimate_sensor_calibration(accel_values, misalignment=False):
+    # At rest a sensor should read exactly 1 g along one of its axes. The axis closest to the
+    # measured mean is taken as the gravity axis. Without misalignment, everything else in
+    # the mean is bias. With misalignment, the off-axis part is treated as a mounting tilt
+    # and removed by a rotation, leaving only the magnitude error as bias. Returns None when
+    # the mean is not close to 1 g.
+    mean = accel_values.mean(axis=0)
+    if abs(np.linalg.norm(mean) - 1) > GRAVITY_TOLERANCE_G:
+        return None
+    gravity_axis = int(np.argmax(np.abs(mean)))
+    nominal = np.zeros(3)
+    nominal[gravity_axis] = np.sign(mean[gravity_axis])
+    if misalignment:
+        magnitude = np.linalg.norm(mean)
+        direction = mean / magnitude
+        offset = (magnitude - 1) * direction
+        matrix = rotation_between(direction, nominal)
+    else:
+        offset = mean - nominal
+        matrix = np.eye(3)
+    return {
+        'offset': offset.tolist(),
+        'matrix': matrix.tolist(),
+        'noise': accel_values.std(axis=0).tolist(),
+    }
+
+
+def estimate_calibration(sensor_ids, time_values, accel_values, misalignment=False, window_s=QUIET_WINDOW_S):
+    # Per-sensor calibration from the quiescent window of each sensor's samples
+    sensor_ids = np.asarray(sensor_ids).astype(str)
+    time_values = np.asarray(time_values, dtype=np.float64)
+    accel_values = np.asarray(accel_values, dtype=np.float64)
+    calibration = {}
+    for sensor_id in np.unique(sensor_ids):
+        rows = np.flatnonzero(sensor_ids == sensor_id)
+        rows = rows[np.argsort(time_values[rows], kind="stable")]
+        window = find_quiescent_window(time_values[rows], accel_values[rows], window_s)
+        if window is None:
+            print(f"Not enough data to calibrate sensor {sensor_id}.")
+            continue
+        start, stop = window
+        estimate = estimate_sensor_calibration(accel_values[rows[start:stop]], misalignment)
+        if estimate is None:
+            magnitude = np.linalg.norm(accel_values[rows[start:stop]].mean(axis=0))
+            print(f"Sensor {sensor_id} reads {magnitude:.3f} g at rest instead of about 1 g; calibrate from "
+                  f"raw, unfiltered data (turn Remove Gravity off while recording).")
+            continue
+        calibration[str(sensor_id)] = estimate
+    return calibration
+
+
+def calibrate_from_file(file_path, misalignment=False, window_s=QUIET_WINDOW_S):
+    data = pd.read_csv(file_path)
+    return estimate_calibration(data['Accelerometer ID'].to_numpy(), data['Time [microseconds]'].to_numpy(),
+                                data[list(ACCEL_COLUMNS)].to_numpy(), misalignment, window_s)
+
+
+def load_calibration(file_path=CONFIG_FILE_PATH):
+    try:
+        with open(file_path, "r") as f:
+            return json.load(f).get(CALIBRATION_KEY, {})
+    except Exception as e:
+        print(f"No calibration loaded: {e}")
+        return {}
+
+
+def save_calibration(calibration, file_path=CONFIG_FILE_PATH):
+    config = {}
+    if os.path.exists(file_path):
+        with open(file_path, "r") as f:
+            config = json.load(f)
+    config[CALIBRATION_KEY] = calibration
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as f:
+        json.dump(config, f, indent=4)
+    print(f"Saved calibration for sensors {', '.join(calibration) or 'none'}")
+
+
+class Calibration:
+    # corrected = matrix @ (raw - offset) per sensor, for a whole interleaved block in one
+    # batched einsum. Sensors without a calibration pass through unchanged.
+    def __init__(self, calibration=None):
+        self.set(calibration or {})
+
+    def set(self, calibration):
+        self.calibration = calibration
+        self.sensor_index = {sensor_id: i for i, sensor_id in enumerate(calibration)}
+        n = len(calibration)
+        # Row n is the identity used for uncalibrated sensors
+        self.offsets = np.zeros((n + 1, 3))
+        self.matrices = np.tile(np.eye(3), (n + 1, 1, 1))
+        for sensor_id, i in self.sensor_index.items():
+            self.offsets[i] = calibration[sensor_id]['offset']
+            self.matrices[i] = calibration[sensor_id]['matrix']
+
+    def apply(self, sensor_ids, accel_values):
+        accel_values = np.asarray(accel_values, dtype=np.float64)
+        if not self.sensor_index:
+            return accel_values
+        index = np.array([self.sensor_index.get(str(sensor_id), len(self.sensor_index)) for sensor_id in sensor_ids])
+        return np.einsum('nij,nj->ni', self.matrices[index], accel_values - self.offsets[index])
@@ -1,7 +1,6 @@
 import csv
 import os
 import json
-import math
 from pathlib import Path
 
 import numpy as np
@@ -11,7 +10,12 @@ from PySide6.QtWidgets import QMessageBox, QFileDialog
 
 import pandas as pd
 
-from fft_analysis_tab import PlotFFT, process_frequency_data, detect_peaks
+from signal_processing import FORCE_COLUMN, to_physical_units
+from fft_analysis_tab import PlotFFT, process_frequency_data, detect_peaks_all, resample_dataframe, \
+    decompose_recording
+
+RECORD_COLUMNS = ["Time [microseconds]", "Accelerometer ID", "X Acceleration", "Y Acceleration",
+                  "Z Acceleration", FORCE_COLUMN]
 
 class DataRecorder(QThread):
     recording_started = Signal()
@@ -94,14 +98,18 @@ class DataRecorder(QThread):
         self.auto_recording_stopped.emit()
         print("Auto Recording Mode Disabled...")
 
-    def auto_record_data(self, timeus, sensor_id, accel_x, accel_y, accel_z):
-        if not self.auto_record_mode:
+    def auto_record_block(self, sensor_ids, times, accels):
+        # Fed with calibrated but not high-passed samples: hit_threshold counts gravity in, so
+        # it means the same whether or not Remove Gravity is on
+        if not self.auto_record_mode or self.recording or self.auto_pending:
             return
 
-        magnitude = math.sqrt(accel_x ** 2 + accel_y ** 2 + accel_z ** 2)
+        magnitudes = np.sqrt(np.sum(np.square(accels), axis=1))
+        hits = np.flatnonzero(magnitudes >= self.hit_threshold)
 
         # Use hit_threshold setting to determine if an impact occurred.
-        if not self.recording and not self.auto_pending and magnitude >= self.hit_threshold:
+        if len(hits):
+            magnitude = magnitudes[hits[0]]
             self.auto_pending = True
             self.impact_detected_signal.emit()
             print(f"Impact detected (magnitude {magnitude:.2f} >= threshold {self.hit_threshold})! "
@@ -131,12 +139,20 @@ class DataRecorder(QThread):
         # Export data using preset modes as before.
         self.export_data("preset")
         self.export_data("modes")
+        self.export_data("fdd")
         self.data_records.clear()
         self.auto_recording_stopped.emit()
 
-    def record_data(self, timeus, sensor_id, accel_x, accel_y, accel_z):
+    def record_data(self, timeus, sensor_id, accel_x, accel_y, accel_z, force=float('nan')):
         if self.recording:
-            self.data_records.append([int(timeus), sensor_id, accel_x, accel_y, accel_z])
+            self.data_records.append([int(timeus), sensor_id, accel_x, accel_y, accel_z, force])
+
+    def records_frame(self):
+        # The force column is only kept when a hammer channel actually delivered data
+        data = pd.DataFrame(self.data_records, columns=RECORD_COLUMNS[:len(self.data_records[0])])
+        if FORCE_COLUMN in data.columns and data[FORCE_COLUMN].isna().all():
+            data = data.drop(columns=FORCE_COLUMN)
+        return data
 
     def export_data(self, mode="data"):
         if not self.data_records:
@@ -176,7 +192,7 @@ class DataRecorder(QThread):
             os.makedirs(directory, exist_ok=True)
             file_path = os.path.join(directory, filename)
             export_method = "preset"
-        elif mode == "modes":
+        elif mode in ("modes", "fdd"):
             config_path = os.path.expanduser("../Preferences/config.json")
             try:
                 with open(config_path, "r") as config_file:
@@ -191,11 +207,12 @@ class DataRecorder(QThread):
             sensor_config = config.get("sensor_configuration", "0")
             bolt_config = "".join(["1" if b else "0" for b in config.get("bolt_configuration", [])])
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"MODES_{striker_config}{sensor_config}{bolt_config}_{timestamp}.csv"
+            prefix = "MODES" if mode == "modes" else "MODES_FDD"
+            filename = f"{prefix}_{striker_config}{sensor_config}{bolt_config}_{timestamp}.csv"
             directory = os.path.expanduser("../Preset_Samples/")
             os.makedirs(directory, exist_ok=True)
             file_path = os.path.join(directory, filename)
-            export_method = "modes"
+            export_method = mode
         else:
             QMessageBox.warning(None, "Export Error", "Invalid export mode specified.")
             return
@@ -204,39 +221,47 @@ class DataRecorder(QThread):
 
         try:
             if mode == "modes":
-                data = pd.DataFrame(self.data_records,
-                                    columns=["Time [microseconds]", "Accelerometer ID", "X Acceleration",
-                                             "Y Acceleration", "Z Acceleration"])
-                modes_data = []
+                data = to_physical_units(self.records_frame())
+                channel_keys = []
+                channel_spectra = []
                 for sensor_id in data["Accelerometer ID"].unique():
-                    sensor_data = data[data["Accelerometer ID"] == sensor_id]
+                    # Resample once per sensor; every axis reuses the uniform grid
+                    sensor_data = resample_dataframe(data[data["Accelerometer ID"] == sensor_id])
                     for axis in ["X Acceleration", "Y Acceleration", "Z Acceleration"]:
                         processed = process_frequency_data(
                             [sensor_data], axis,
                             self.plot_fft_instance.padding_factor,
-                            self.plot_fft_instance.plot_mode
+                            self.plot_fft_instance.plot_mode,
+                            **self.plot_fft_instance.analysis_options()
                         )
                         if processed:
-                            freq_data = processed[0]
-                            positive_freqs = freq_data["positive_freqs"]
-                            positive_magnitudes = freq_data["positive_magnitudes"]
-
-                            # Use the loaded detection_tolerance setting for peak detection.
-                            natural_frequencies, _ = detect_peaks(positive_freqs, positive_magnitudes, self.detection_tolerance)
-                            for freq in natural_frequencies:
-                                modes_data.append([sensor_id, axis, freq])
+                            channel_keys.append((sensor_id, axis))
+                            channel_spectra.append(processed[0])
+
+                # Use the loaded detection_tolerance setting for peak detection, all channels in one pass.
+                peak_tables = detect_peaks_all(channel_spectra, self.detection_tolerance,
+                                               self.plot_fft_instance.peak_min_snr, log_decrement=True)
+                modes_data = []
+                for (sensor_id, axis), peak_table in zip(channel_keys, peak_tables):
+                    for freq, half_power, log_decrement in zip(peak_table["frequencies"],
+                                                               peak_table["damping_half_power"],
+                                                               peak_table["damping_log_decrement"]):
+                        modes_data.append([sensor_id, axis, freq, half_power, log_decrement])
                 freq_dict = {}
-                for sensor_id, axis, freq in modes_data:
+                for sensor_id, axis, freq, half_power, log_decrement in modes_data:
                     grouped = False
                     for key in list(freq_dict.keys()):
                         if abs(freq - key) <= 0.008:  # 0.008 Hz tolerance
                             freq_dict[key]["sensor_ids"].add(sensor_id)
                             freq_dict[key]["axes"].add(axis)
                             freq_dict[key]["values"].append(freq)  # Store values for averaging
+                            freq_dict[key]["half_power"].append(half_power)
+                            freq_dict[key]["log_decrement"].append(log_decrement)
                             grouped = True
                             break
                     if not grouped:
-                        freq_dict[freq] = {"sensor_ids": {sensor_id}, "axes": {axis}, "values": [freq]}
+                        freq_dict[freq] = {"sensor_ids": {sensor_id}, "axes": {axis}, "values": [freq],
+                                           "half_power": [half_power], "log_decrement": [log_decrement]}
 
                 combined_modes = []
                 mode_number = 1
@@ -246,19 +271,44 @@ class DataRecorder(QThread):
                     avg_freq = round(np.mean(values["values"]), 3)  # Average the grouped frequencies
                     sensor_ids = ", ".join(map(str, sorted(values["sensor_ids"])))
                     axes = "".join(sorted([axis[0] for axis in values["axes"]])) + " Acceleration"
-                    combined_modes.append([mode_number, avg_freq, sensor_ids, axes])
+                    # Channels without an estimate are NaN and left out of the average
+                    half_power = np.array(values["half_power"], dtype=np.float64)
+                    log_decrement = np.array(values["log_decrement"], dtype=np.float64)
+                    half_power = round(np.nanmean(half_power), 5) if np.isfinite(half_power).any() else np.nan
+                    log_decrement = round(np.nanmean(log_decrement), 5) if np.isfinite(log_decrement).any() else np.nan
+                    combined_modes.append([mode_number, avg_freq, sensor_ids, axes, half_power, log_decrement])
                     mode_number += 1
 
                 modes_df = pd.DataFrame(combined_modes,
-                                        columns=["Mode Number", "Natural Frequency (Hz)", "Sensor ID", "Axis"])
+                                        columns=["Mode Number", "Natural Frequency (Hz)", "Sensor ID", "Axis",
+                                                 "Damping Ratio (Half-Power)", "Damping Ratio (Log Decrement)"])
                 modes_df.to_csv(file_path, index=False)
                 print(f"Natural frequencies exported to {file_path}")
+            elif mode == "fdd":
+                # One decomposition over all sensors/axes: modes from the first singular value,
+                # with the mode shape component of every channel alongside
+                data = to_physical_units(self.records_frame())
+                result = decompose_recording(data, self.plot_fft_instance.padding_factor,
+                                             self.plot_fft_instance.precision, self.plot_fft_instance.fixed_length,
+                                             max_frequency=self.plot_fft_instance.max_frequency)
+                if result is None:
+                    print("Not enough data for frequency-domain decomposition.")
+                    return
+                peak_table = detect_peaks_all([result['spectrum']], self.detection_tolerance,
+                                              self.plot_fft_instance.peak_min_snr)[0]
+                shape_columns = [f"S{sensor_id} {axis[0]}" for sensor_id, axis in result['labels']]
+                modes_df = pd.DataFrame(result['band_shapes'][peak_table["indices"]].real.round(4),
+                                        columns=shape_columns)
+                modes_df.insert(0, "Natural Frequency (Hz)", np.round(peak_table["frequencies"], 3))
+                modes_df.insert(0, "Mode Number", np.arange(1, len(modes_df) + 1))
+                modes_df.to_csv(file_path, index=False)
+                print(f"FDD modes exported to {file_path}")
             else:
+                data = self.records_frame()
                 with open(file_path, "w", newline="") as file:
                     writer = csv.writer(file)
-                    writer.writerow(["Time [microseconds]", "Accelerometer ID", "X Acceleration", "Y Acceleration",
-                                     "Z Acceleration"])
-                    writer.writerows(self.data_records)
+                    writer.writerow(data.columns)
+                    writer.writerows(data.itertuples(index=False))
                 if export_method == "dialog":
                     QMessageBox.information(None, "Export Success", "Data exported successfully.")
                 print(f"Data exported to {file_path}")
@@ -274,9 +324,10 @@ class DataRecorder(QThread):
             data = pd.read_csv(file_path)
             data = data.apply(pd.to_numeric, errors='coerce')
             data = data.dropna(subset=['Time [microseconds]', 'X Acceleration', 'Y Acceleration', 'Z Acceleration'])
+            data = to_physical_units(data)
             datasets_filtered = []
             for sensor_id in data['Accelerometer ID'].unique():
-                sensor_data = data[data['Accelerometer ID'] == sensor_id]
+                sensor_data = resample_dataframe(data[data['Accelerometer ID'] == sensor_id])
                 for axis in ['X Acceleration', 'Y Acceleration', 'Z Acceleration']:
                     if axis not in sensor_data.columns:
                         print("Axis {} not found in sensor data. Skipping.".format(axis))
@@ -287,7 +338,8 @@ class DataRecorder(QThread):
                     processed = process_frequency_data(
                         [axis_data], axis,
                         self.plot_fft_instance.padding_factor,
-                        self.plot_fft_instance.plot_mode
+                        self.plot_fft_instance.plot_mode,
+                        **self.plot_fft_instance.analysis_options()
                     )
                     if processed:
                         freq_data = processed[0]
@@ -311,11 +363,10 @@ class DataRecorder(QThread):
                         print("FFT processing returned no results for sensor {} axis {}".format(sensor_id, axis))
 
             all_natural_frequencies = []
-            for ds in datasets_filtered:
-                pos_freqs = ds["positive_freqs"]
-                pos_mags = ds["positive_magnitudes"]
-                natural_freqs, _ = detect_peaks(pos_freqs, pos_mags, self.detection_tolerance)
-                all_natural_frequencies.extend(natural_freqs)
+            peak_tables = detect_peaks_all(datasets_filtered, self.detection_tolerance,
+                                           self.plot_fft_instance.peak_min_snr)
+            for peak_table in peak_tables:
+                all_natural_frequencies.extend(peak_table["frequencies"])
             unique_freqs = np.unique(np.round(all_natural_frequencies, decimals=2))
             print("Detected Natural Frequencies:")
             for freq in unique_freqs:
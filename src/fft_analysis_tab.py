@@ -1,28 +1,46 @@
+import os
+import time
+from functools import partial
+
 import numpy as np
 import pandas as pd
 import pyqtgraph as pg
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import QRectF, Qt, QTimer
 from PySide6.QtWidgets import QGridLayout, QWidget, QPushButton, QVBoxLayout, \
     QFileDialog, QComboBox, QHBoxLayout, QLabel, \
-    QSlider, QListWidget, QListWidgetItem
-from scipy.signal import find_peaks, welch
+    QSlider, QListWidget, QListWidgetItem, QCheckBox
+
+from signal_processing import ANALYSIS_STRATEGIES, DEFAULT_FFT_LENGTH, MIN_ANALYSIS_SAMPLES, compute_spectrum, \
+    format_analysis_info, stream_psd_from_csv, PRECISIONS, ACCEL_COLUMNS, FORCE_COLUMN, detect_peaks_batch, \
+    resample_uniform, log_decrement_damping, SegmentSpectra, decimation_factor, analysis_info
+
+from workers import Cancelled, LatestWinsRunner, ProcessPoolRunner, QueuedRunner
+from plot_helpers import DecimatedCurve, MinMaxPyramid
+from sample_loader import SensorIndex, has_fresh_cache, load_sample, time_window
+from spectrum_export import COMPACT_SUFFIX, export_results
+
+from modal_analysis import batch_spectra, ensemble_spectra, find_hits, merge_intervals, channel_frames, compute_frf, \
+    response_frames, frequency_domain_decomposition
+
+DEFAULT_PEAK_SNR = 3.0  # Peaks must rise this far above the rolling-median noise floor
+WATERFALL_MAX_BINS = 4096  # Frequency columns of the waterfall image
+WATERFALL_FLOOR = 1e-3  # Magnitudes below this (on the 0-1000 scale) show as -120 dB
+PREVIEW_FFT_LENGTH = 1024  # Drag previews of the "full" strategy average segments this long instead
 
 
-def process_frequency_data(datasets, selected_axis, padding_factor, plot_mode):
+def process_frequency_data(datasets, selected_axis, padding_factor, plot_mode, length_strategy="full",
+                           fixed_length=DEFAULT_FFT_LENGTH, precision="float64", max_frequency=None):
+    dtype = PRECISIONS[precision][0]
     results = []
-    # Define gravity offsets for each axis (adjust these values based on calibration)
-    gravity_offsets = {'X': -9.8124, 'Y': 0.0, 'Z': 0.0}
 
     for data in datasets:
         if data.empty:
             continue
 
-        # Convert acceleration data to physical units and correct for gravity
-        accel_data = 9.8124 * data[selected_axis].to_numpy()
-        accel_data -= gravity_offsets.get(selected_axis, 0.0)
-
-        # Optional: Commented out mean subtraction if not needed
-        # accel_data -= np.mean(accel_data)
+        # Data is in m/s² from load; removing the mean takes out gravity in any mounting
+        # orientation (live data is already high-passed at ingest)
+        accel_data = data[selected_axis].to_numpy(dtype=dtype, copy=True)
+        accel_data -= np.mean(accel_data)
 
         time_data = data['Time [microseconds]'].to_numpy()
         if np.max(time_data) < 1000:
@@ -31,9 +49,7 @@ def process_frequency_data(datasets, selected_axis, padding_factor, plot_mode):
         else:
             time = time_data * 1e-6  # Convert microseconds to seconds
 
-        N_fixed = 5096  # Fixed FFT length
-
-        if len(accel_data) < N_fixed:
+        if len(accel_data) < MIN_ANALYSIS_SAMPLES:
             print("Not enough data points.")
             continue
 
@@ -41,110 +57,224 @@ def process_frequency_data(datasets, selected_axis, padding_factor, plot_mode):
         if dt <= 0:
             continue  # Prevent invalid time steps
 
-        # Use only the first N_fixed samples
-        accel_data = accel_data[:N_fixed]
-
-        # Apply a Hann window for balanced spectral response
-        window = np.hanning(N_fixed)
-        accel_data_windowed = accel_data * window
-
-        # Zero-pad to next power of 2 using the given padding_factor
-        padded_length = int(2 ** np.ceil(np.log2(N_fixed * padding_factor)))
-        accel_data_padded = np.pad(
-            accel_data_windowed, (0, padded_length - N_fixed), mode="constant"
-        )
-
-        if plot_mode == "FFT":
-            fft_accel = np.fft.fft(accel_data_padded)
-            freq = np.fft.fftfreq(len(accel_data_padded), d=dt)
-            # Keep only positive frequencies
-            positive_freqs = freq[:len(freq) // 2]
-            positive_magnitudes = np.abs(fft_accel)[:len(freq) // 2]
-
-        elif plot_mode == "PSD":
-            padded_len = len(accel_data_padded)
-            dynamic_factor = 2
-            nperseg = max(256, int(padded_len / dynamic_factor))
-            noverlap = int(nperseg * 0.5)
-            freq, psd = welch(
-                accel_data_padded,
-                fs=1 / dt,
-                window="hann",
-                nperseg=nperseg,
-                noverlap=noverlap,
-                scaling="density"
+        try:
+            positive_freqs, positive_magnitudes, info = compute_spectrum(
+                accel_data, dt, padding_factor, plot_mode, length_strategy, fixed_length, precision, max_frequency
             )
-            # Convert PSD (power/Hz) to amplitude spectral density (ASD)
-            positive_freqs = freq
-            positive_magnitudes = np.sqrt(psd)
-        else:
-            print(f"Unknown plot mode: {plot_mode}")
+        except ValueError as e:
+            print(e)
             continue
 
-        # Optionally, remove frequencies below a given minimum (e.g., below 2 Hz)
-        min_frequency = 4  # Hz
-        valid_indices = positive_freqs >= min_frequency
-        positive_freqs = positive_freqs[valid_indices]
-        positive_magnitudes = positive_magnitudes[valid_indices]
-
-        # Normalize magnitudes to 0-1
-        positive_magnitudes -= positive_magnitudes.min()
-        if positive_magnitudes.max() > 0:
-            positive_magnitudes /= positive_magnitudes.max()
-
-        # Scale magnitudes to 0-1000
-        positive_magnitudes *= 1000
+        positive_freqs, positive_magnitudes = normalize_spectrum(positive_freqs, positive_magnitudes,
+                                                                 max_frequency=max_frequency)
 
         results.append({
             'positive_freqs': positive_freqs,
             'positive_magnitudes': positive_magnitudes,
-            'dt': dt
+            'dt': dt,
+            'analysis_info': info,
+            'samples': accel_data,  # Time signal, for log-decrement damping
+            'dataset_index': data['Dataset Index'].iloc[0] if 'Dataset Index' in data.columns else None
         })
 
     return results
 
-def detect_peaks(positive_freqs, positive_magnitudes, tolerance):
-    peaks, properties = find_peaks(positive_magnitudes, height=tolerance)
-    natural_frequencies = positive_freqs[peaks]
-    peak_magnitudes = positive_magnitudes[peaks]
-    return natural_frequencies, peak_magnitudes
-
-def plot_frequency_data(processed_data, plot_widget, freq_list_widget, tolerance, dataset_colors, selected_axis, selected_accel, plot_mode, freq_info_label):
-    plot_widget.clear()
-    freq_list_widget.clear()
-    all_natural_frequencies = []
-
+def resample_dataframe(data):
+    # Puts one sensor's samples on a uniform grid at its fitted true rate. All axes share the
+    # grid, so the result serves every axis and every FFT/PSD call.
+    if len(data) < MIN_ANALYSIS_SAMPLES:
+        return data
+    if not data['Time [microseconds]'].is_monotonic_increasing:
+        data = data.sort_values(by='Time [microseconds]')
+    axes = [column for column in ACCEL_COLUMNS + (FORCE_COLUMN,) if column in data.columns]
+    try:
+        grid, values, period = resample_uniform(data['Time [microseconds]'].to_numpy(dtype=np.float64),
+                                                data[axes].to_numpy())
+    except ValueError as e:
+        print(f"Resampling skipped: {e}")
+        return data
+    resampled = pd.DataFrame(values, columns=axes)
+    resampled.insert(0, 'Time [microseconds]', grid)
+    # Per-sensor data, so identifying columns are constant
+    for column in data.columns:
+        if column not in resampled.columns:
+            resampled[column] = data[column].iloc[0]
+    resampled.attrs['sample_period'] = period
+    return resampled
+
+def sensor_frame(dataset, index, selected_id, resample):
+    # One sensor's rows of a loaded dataset (all rows without sensor ids), optionally on a
+    # uniform grid. Reads its inputs only, so it is safe on the plot worker thread.
+    if selected_id and 'Accelerometer ID' in dataset.columns:
+        data = index.sensor(selected_id)
+        if data.empty:
+            return pd.DataFrame()
+    else:
+        data = dataset
+    return resample_dataframe(data) if resample else data
+
+def sensor_channels(data, start_time=None, end_time=None):
+    # Every sensor/axis of one recording on a single uniform grid spanning the window where
+    # all sensors have data, plus the force channel when one was recorded. Returns None if
+    # the window holds too little data.
+    if data.empty or 'Accelerometer ID' not in data.columns:
+        return None
+    if start_time is not None:
+        data = data[(data['Time [microseconds]'] >= start_time) & (data['Time [microseconds]'] <= end_time)]
+    axes = [column for column in ACCEL_COLUMNS if column in data.columns]
+    sensors = []
+    for sensor_id, sensor_data in data.groupby('Accelerometer ID'):
+        if len(sensor_data) >= MIN_ANALYSIS_SAMPLES:
+            sensors.append((str(sensor_id), sensor_data['Time [microseconds]'].to_numpy(dtype=np.float64),
+                            sensor_data[axes].to_numpy()))
+    if not sensors:
+        return None
+    period = float(np.median([np.median(np.diff(time_values)) for _, time_values, _ in sensors]))
+    first = max(time_values[0] for _, time_values, _ in sensors)
+    last = min(time_values[-1] for _, time_values, _ in sensors)
+    grid = np.arange(first, last, period) if period > 0 else np.empty(0)
+    if len(grid) < MIN_ANALYSIS_SAMPLES:
+        return None
+
+    labels = []
+    channels = np.empty((len(sensors) * len(axes), len(grid)))
+    for i, (sensor_id, time_values, values) in enumerate(sensors):
+        for j, axis in enumerate(axes):
+            channels[i * len(axes) + j] = np.interp(grid, time_values, values[:, j])
+            labels.append((sensor_id, axis))
+
+    force = None
+    if FORCE_COLUMN in data.columns:
+        force_data = data[['Time [microseconds]', FORCE_COLUMN]].dropna().sort_values(by='Time [microseconds]')
+        if len(force_data) >= MIN_ANALYSIS_SAMPLES:
+            force = np.interp(grid, force_data['Time [microseconds]'].to_numpy(dtype=np.float64),
+                              force_data[FORCE_COLUMN].to_numpy(dtype=np.float64))
+    return {'time': grid, 'dt': period * 1e-6, 'channels': channels, 'labels': labels, 'force': force}
+
+def decompose_recording(data, padding_factor, precision="float64", frame_length=DEFAULT_FFT_LENGTH,
+                        start_time=None, end_time=None, max_frequency=None):
+    # Frequency-domain decomposition of every sensor/axis in one recording. Returns the FDD
+    # result with channel labels and the first singular value curve scaled like a spectrum.
+    channel_data = sensor_channels(data, start_time, end_time)
+    if channel_data is None:
+        return None
+    frame_length = min(frame_length, channel_data['channels'].shape[1])
+    result = frequency_domain_decomposition(response_frames(channel_data['channels'], frame_length),
+                                            channel_data['dt'], padding_factor, precision)
+    result['labels'] = channel_data['labels']
+    valid_indices = spectrum_band_mask(result['freqs'], max_frequency=max_frequency)
+    positive_freqs, positive_magnitudes = normalize_spectrum(result['freqs'], result['singular_values'][:, 0].copy(),
+                                                             max_frequency=max_frequency)
+    result['band_shapes'] = result['shapes'][valid_indices]
+    result['spectrum'] = {
+        'positive_freqs': positive_freqs,
+        'positive_magnitudes': positive_magnitudes,
+        'dt': result['dt'],
+        'analysis_info': result['info']
+    }
+    return result
+
+def segment_recording(data):
+    # Impacts found independently on every sensor, then merged so one hit is one segment
+    if data.empty or 'Accelerometer ID' not in data.columns:
+        return np.empty((0, 2))
+    axes = [column for column in ACCEL_COLUMNS if column in data.columns]
+    intervals = [find_hits(sensor_data['Time [microseconds]'].to_numpy(), sensor_data[axes].to_numpy())
+                 for _, sensor_data in data.groupby('Accelerometer ID')]
+    return merge_intervals(np.vstack(intervals)) if intervals else np.empty((0, 2))
+
+def spectrum_band_mask(positive_freqs, min_frequency=4, max_frequency=None):
+    # Optionally, remove frequencies below a given minimum (e.g., below 2 Hz)
+    valid_indices = positive_freqs >= min_frequency
+    if max_frequency:
+        valid_indices &= positive_freqs <= max_frequency
+    return valid_indices
+
+def normalize_spectrum(positive_freqs, positive_magnitudes, min_frequency=4, max_frequency=None):
+    valid_indices = spectrum_band_mask(positive_freqs, min_frequency, max_frequency)
+    positive_freqs = positive_freqs[valid_indices]
+    positive_magnitudes = positive_magnitudes[valid_indices]
+
+    # Normalize magnitudes to 0-1
+    positive_magnitudes -= positive_magnitudes.min()
+    if positive_magnitudes.max() > 0:
+        positive_magnitudes /= positive_magnitudes.max()
+
+    # Scale magnitudes to 0-1000
+    positive_magnitudes *= 1000
+    return positive_freqs, positive_magnitudes
+
+def detect_peaks(positive_freqs, positive_magnitudes, tolerance, min_snr=DEFAULT_PEAK_SNR):
+    peak_table = detect_peaks_batch([(positive_freqs, positive_magnitudes)], tolerance, min_snr)[0]
+    return peak_table['frequencies'], peak_table['magnitudes']
+
+def detect_peaks_all(processed_data, tolerance, min_snr=DEFAULT_PEAK_SNR, log_decrement=False):
+    # One batched peak pass over every processed spectrum; half-power damping comes with it.
+    # Log-decrement damping needs the time signal, so it is only added on request (exports).
+    spectra = [(freq_data['positive_freqs'], freq_data['positive_magnitudes']) for freq_data in processed_data]
+    peak_tables = detect_peaks_batch(spectra, tolerance, min_snr)
+    if log_decrement:
+        for freq_data, peak_table in zip(processed_data, peak_tables):
+            if 'samples' in freq_data:
+                peak_table['damping_log_decrement'] = log_decrement_damping(
+                    freq_data['samples'], freq_data['dt'], peak_table['frequencies'])
+    return peak_tables
+
+def plot_frequency_data(processed_data, plot_widget, freq_list_widget, tolerance, dataset_colors, selected_axis, selected_accel, plot_mode, freq_info_label, min_snr=DEFAULT_PEAK_SNR, peak_tables=None):
     if not hasattr(plot_widget, 'fft_legend'):
         plot_widget.fft_legend = plot_widget.addLegend()
 
-    for i, freq_data in enumerate(processed_data):
-        positive_freqs = freq_data['positive_freqs']
-        positive_magnitudes = freq_data['positive_magnitudes']
-        dt = freq_data['dt']
-
-        natural_frequencies, peak_magnitudes = detect_peaks(positive_freqs, positive_magnitudes, tolerance)
-        all_natural_frequencies.extend(natural_frequencies)
-
-        pen = pg.mkPen(color=dataset_colors[i % len(dataset_colors)], width=1)
-        plot_widget.plot(positive_freqs, positive_magnitudes, pen=pen,
-                         name="{} - Accel {} (Dataset {})".format(selected_axis, selected_accel, i + 1))
-
-        symbol_pen = pg.mkPen(color=dataset_colors[i % len(dataset_colors)])
-        symbol_brush = pg.mkBrush(color=dataset_colors[i % len(dataset_colors)])
-        fft_peak_item = pg.ScatterPlotItem(x=natural_frequencies, y=peak_magnitudes,
-                                           pen=symbol_pen, brush=symbol_brush, size=10, symbol='o')
-        plot_widget.addItem(fft_peak_item)
-        fft_peak_item.setZValue(10)
+    # One curve and one peak scatter per dataset, kept on the widget and updated in place.
+    # They (and their legend entries) are only recreated when the set of datasets changes.
+    layout = [("{} - Accel {} (Dataset {})".format(selected_axis, selected_accel, i + 1),
+               dataset_colors[i % len(dataset_colors)]) for i in range(len(processed_data))]
+    fft_items = getattr(plot_widget, 'fft_items', [])
+    if layout != getattr(plot_widget, 'fft_layout', None) or any(item.getViewBox() is None for item in fft_items):
+        for item in fft_items:
+            plot_widget.removeItem(item)
+        plot_widget.fft_curves = []
+        for name, color in layout:
+            curve = plot_widget.plot(pen=pg.mkPen(color=color, width=1), name=name)
+            fft_peak_item = pg.ScatterPlotItem(pen=pg.mkPen(color=color), brush=pg.mkBrush(color=color),
+                                               size=10, symbol='o')
+            plot_widget.addItem(fft_peak_item)
+            fft_peak_item.setZValue(10)
+            plot_widget.fft_curves.append((curve, fft_peak_item))
+        plot_widget.fft_items = [item for pair in plot_widget.fft_curves for item in pair]
+        plot_widget.fft_layout = layout
+    # Anything else on the plot (envelopes, coherence, selected peaks) belongs to the previous view
+    kept = {id(item) for item in plot_widget.fft_items}
+    for item in list(plot_widget.getPlotItem().items):
+        if id(item) not in kept:
+            plot_widget.removeItem(item)
+
+    if peak_tables is None:
+        peak_tables = detect_peaks_all(processed_data, tolerance, min_snr)
+    for (curve, fft_peak_item), freq_data, peak_table in zip(plot_widget.fft_curves, processed_data, peak_tables):
+        curve.setData(freq_data['positive_freqs'], freq_data['positive_magnitudes'], skipFiniteCheck=True)
+        fft_peak_item.setData(x=peak_table['frequencies'], y=peak_table['magnitudes'])
+
+    update_peak_list(freq_list_widget, peak_tables)
+    plot_widget.enableAutoRange(axis='xy', enable=True)
+    label_frequency_plot(processed_data, plot_widget, selected_axis, selected_accel, plot_mode, freq_info_label)
 
+def update_peak_list(freq_list_widget, peak_tables):
+    all_natural_frequencies = [frequency for peak_table in peak_tables for frequency in peak_table['frequencies']]
     unique_natural_frequencies = np.unique(np.round(all_natural_frequencies, decimals=2))
-    for freq in unique_natural_frequencies:
-        freq_list_widget.addItem("{:.2f} Hz".format(freq))
-
-    plot_widget.enableAutoRange(axis='xy', enable=True)
+    labels = ["{:.2f} Hz".format(freq) for freq in unique_natural_frequencies]
+    if labels != [freq_list_widget.item(i).text() for i in range(freq_list_widget.count())]:
+        freq_list_widget.clear()
+        freq_list_widget.addItems(labels)
+    elif freq_list_widget.selectedItems():
+        # Same peaks and selection, but the selected markers must follow the new spectra
+        freq_list_widget.itemSelectionChanged.emit()
+
+def label_frequency_plot(processed_data, plot_widget, selected_axis, selected_accel, plot_mode, freq_info_label):
     if processed_data:
         dt = processed_data[0]['dt']
         sampling_freq = 1 / dt
-        freq_info_label.setText("dt: {:.10f} s\n1/dt: {:.4f} Hz".format(dt, sampling_freq))
+        freq_info_label.setText("dt: {:.10f} s\n1/dt: {:.4f} Hz\n{}".format(
+            dt, sampling_freq, format_analysis_info(processed_data[0]['analysis_info'])))
         mode_title = "FFT" if plot_mode == "FFT" else "PSD"
         plot_widget.setLabel('left', 'Magnitude')
         plot_widget.setLabel('bottom', 'Frequency (Hz)')
@@ -152,8 +282,63 @@ def plot_frequency_data(processed_data, plot_widget, freq_list_widget, tolerance
     else:
         plot_widget.setTitle("No Data Loaded")
 
+def waterfall_image(processed_data, max_bins=WATERFALL_MAX_BINS):
+    # Every spectrum interpolated onto one frequency grid spanning them all, in dB below the
+    # 0-1000 full scale: (grid, image with one row per spectrum)
+    spectra = [(freq_data['positive_freqs'], freq_data['positive_magnitudes']) for freq_data in processed_data]
+    filled = [freqs for freqs, _ in spectra if len(freqs)]
+    if not filled:
+        return np.empty(0), np.empty((0, 0))
+    low = min(freqs[0] for freqs in filled)
+    high = max(freqs[-1] for freqs in filled)
+    grid = np.linspace(low, high, min(max_bins, max(len(freqs) for freqs in filled)))
+    image = np.full((len(spectra), len(grid)), WATERFALL_FLOOR)
+    for row, (freqs, magnitudes) in enumerate(spectra):
+        if len(freqs):
+            image[row] = np.interp(grid, freqs, magnitudes, left=WATERFALL_FLOOR, right=WATERFALL_FLOOR)
+    return grid, 20 * np.log10(np.maximum(image, WATERFALL_FLOOR) / 1000)
+
+def plot_waterfall_data(processed_data, plot_widget, freq_list_widget, selected_axis, selected_accel, plot_mode,
+                        freq_info_label, peak_tables):
+    # One ImageItem (row per spectrum) and one scatter for all peaks, so drawing cost does not
+    # grow with the number of captures. Replaces the per-dataset curves of plot_frequency_data.
+    for item in getattr(plot_widget, 'fft_items', []):
+        plot_widget.removeItem(item)
+    plot_widget.fft_items, plot_widget.fft_curves, plot_widget.fft_layout = [], [], None
+    image_item = getattr(plot_widget, 'waterfall_image', None)
+    if image_item is None or image_item.getViewBox() is None:
+        plot_widget.clear()
+        image_item = plot_widget.waterfall_image = pg.ImageItem(axisOrder='row-major')
+        image_item.setColorMap(pg.colormap.get('viridis'))
+        plot_widget.waterfall_peaks = pg.ScatterPlotItem(pen=pg.mkPen('w'), brush=None, size=6, symbol='o')
+        plot_widget.addItem(image_item)
+        plot_widget.addItem(plot_widget.waterfall_peaks)
+        plot_widget.waterfall_peaks.setZValue(10)
+    grid, image = waterfall_image(processed_data)
+    if image.size:
+        image_item.setImage(image, levels=(image.min(), 0))
+        image_item.setRect(QRectF(grid[0], 0, grid[-1] - grid[0], len(image)))
+    else:
+        image_item.clear()
+    rows = [np.full(len(peak_table['frequencies']), row + 0.5) for row, peak_table in enumerate(peak_tables)]
+    plot_widget.waterfall_peaks.setData(
+        x=np.concatenate([peak_table['frequencies'] for peak_table in peak_tables] or [np.empty(0)]),
+        y=np.concatenate(rows or [np.empty(0)]))
+    update_peak_list(freq_list_widget, peak_tables)
+    plot_widget.enableAutoRange(axis='xy', enable=True)
+    label_frequency_plot(processed_data, plot_widget, selected_axis, selected_accel, plot_mode, freq_info_label)
+    plot_widget.setLabel('left', 'Capture')
+
 class PlotFFT(QWidget):
     SLIDER_CONVERSION = 100000  # Conversion factor for slider values (each step equals 100,000 µs)
+    PREVIEW_INTERVAL_MS = 50  # At most one coarse spectrum per interval while a slider is dragged
+    REFINE_IDLE_MS = 400  # A dragged slider resting this long gets the full spectrum
+    SEGMENT_CACHE_ENTRIES = 8  # SegmentSpectra kept across plots, least recently used dropped first
+    # Worker processes take ~2 s to start and CSVs parse at ~30 MB/s, so the pool is only used
+    # for several uncached files that add up to a few seconds of parsing
+    MIN_POOLED_FILES = 2
+    MIN_POOLED_BYTES = 64 << 20
+    DATASET_COLORS = ['#2541B2', '#D8973C', '#34A5DA', '#F7F5FB', '#A14A44', '#44A1A0']
 
     def __init__(self):
         super().__init__()
@@ -164,6 +349,24 @@ class PlotFFT(QWidget):
         self.datasets = []  # initialize datasets as an empty list
         self.padding_factor = 5
         self.plot_mode = "FFT"  # Default mode
+        self.length_strategy = "full"  # Analyse the whole selected window by default
+        self.fixed_length = DEFAULT_FFT_LENGTH
+        self.precision = "float64"
+        self.peak_min_snr = DEFAULT_PEAK_SNR
+        self.max_frequency = None  # None analyses the full band without decimation
+        self.resample_enabled = True
+        self.resampled_cache = {}  # (dataset id, sensor id, resampled) -> (dataset, per-sensor DataFrame)
+        self.segment_cache = {}  # (frame id, axis, segment length, padding, precision) -> (frame, SegmentSpectra)
+        self.waterfall_enabled = False  # One heat-map image instead of a curve per dataset
+        self.dataset_names = {}  # File index -> file name, for waterfall rows
+        self.region_window = None  # (start, end) µs picked on the time plot; None follows the sliders
+        self.sensor_indexes = {}  # dataset id -> SensorIndex
+        self.pyramid_cache = {}  # (dataset id, axis, precision) -> (per-sensor DataFrame, MinMaxPyramid)
+        self.time_curves = []  # DecimatedCurve per plotted dataset, updated in place
+        self.time_layout = None  # (legend name, colour) of each time curve
+        self.hit_segments = []  # (dataset index, start µs, end µs) for every detected impact
+        self.frf_results = []  # compute_frf output (plus channel labels) per dataset from the last FRF run
+        self.fdd_results = []  # decompose_recording output per dataset from the last FDD run
 
         # Timers for debouncing
         self.update_timer = QTimer()
@@ -173,6 +376,26 @@ class PlotFFT(QWidget):
         self.slider_timer.setSingleShot(True)
         self.slider_timer.setInterval(200)
         self.slider_timer.timeout.connect(self.update_plot)
+        # While a slider is dragged: quick unpadded previews, then the full spectrum once it rests
+        self.preview_timer = QTimer()
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(self.PREVIEW_INTERVAL_MS)
+        self.preview_timer.timeout.connect(self.preview_plot)
+        self.refine_timer = QTimer()
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.setInterval(self.REFINE_IDLE_MS)
+        self.refine_timer.timeout.connect(self.refine_plot)
+        self.drag_refined = False  # The full spectrum already matches the resting slider
+        # Filtering, FFT and peak detection for update_plot run off the GUI thread
+        self.plot_runner = LatestWinsRunner(self)
+        self.export_runner = QueuedRunner(self)  # Exports are written off the GUI thread, each one in full
+        # Several uncached files picked in Open CSV are parsed in parallel worker processes
+        self.file_loader = ProcessPoolRunner(self)
+        self.pooled_files = []  # File index of each job of the current file_loader batch
+        self.file_loader.result_ready.connect(self.on_file_loaded)
+        self.file_loader.job_failed.connect(lambda index, message: print(f"Error loading data: {message}"))
+        self.file_loader.batch_finished.connect(self.finish_loading)
+        self.loaded_datasets = {}  # File index -> dataset, for the files opened by the last Open CSV
 
         # Main layout (Left: plots and controls; Right: frequency info)
         main_layout = QHBoxLayout()
@@ -197,6 +420,14 @@ class PlotFFT(QWidget):
         self.plot_widget_time.setBackground("#2b2b2b")
         self.plot_widget_fft = pg.PlotWidget()
         self.plot_widget_fft.setBackground("#2b2b2b")
+        self.plot_widget_fft.scene().sigMouseClicked.connect(self.on_fft_clicked)
+
+        # Sample-accurate window selection on the time plot, kept in step with the sliders
+        self.time_region = pg.LinearRegionItem(brush=pg.mkBrush(255, 255, 255, 30))
+        self.time_region.setZValue(20)
+        self.time_region.sigRegionChanged.connect(self.on_region_changed)
+        self.time_region.sigRegionChangeFinished.connect(self.on_region_change_finished)
+        self.plot_widget_time.addItem(self.time_region, ignoreBounds=True)
 
         container_layout.addWidget(self.plot_widget_time)
         container_layout.addWidget(self.plot_widget_fft)
@@ -244,6 +475,33 @@ class PlotFFT(QWidget):
         accel_row.addWidget(self.axis_selection)
         left_layout.addLayout(accel_row)
 
+        # Analysis length strategy selection
+        self.strategy_selection = QComboBox()
+        for key, label in ANALYSIS_STRATEGIES.items():
+            self.strategy_selection.addItem(label, key)
+        self.strategy_selection.currentIndexChanged.connect(self.update_length_strategy)
+
+        strategy_row = QHBoxLayout()
+        strategy_row.addWidget(QLabel("Analysis Length:"))
+        strategy_row.addWidget(self.strategy_selection)
+
+        # Highest frequency of interest; drives the anti-alias decimation factor
+        self.max_frequency_selection = QComboBox()
+        self.max_frequency_selection.addItem("Full Band", None)
+        for max_frequency in (250, 500, 1000, 2000):
+            self.max_frequency_selection.addItem(f"{max_frequency} Hz", max_frequency)
+        self.max_frequency_selection.currentIndexChanged.connect(self.update_max_frequency)
+        strategy_row.addWidget(QLabel("Max Frequency:"))
+        strategy_row.addWidget(self.max_frequency_selection)
+        self.resample_checkbox = QCheckBox("Uniform Resampling")
+        self.resample_checkbox.setChecked(self.resample_enabled)
+        self.resample_checkbox.stateChanged.connect(self.update_resampling)
+        strategy_row.addWidget(self.resample_checkbox)
+        self.waterfall_checkbox = QCheckBox("Waterfall")
+        self.waterfall_checkbox.stateChanged.connect(self.update_waterfall)
+        strategy_row.addWidget(self.waterfall_checkbox)
+        left_layout.addLayout(strategy_row)
+
         # Button grid for export, open CSV, and toggle
         self.export_button = QPushButton("Export CSV")
         self.export_button.clicked.connect(self.export_data)
@@ -251,12 +509,15 @@ class PlotFFT(QWidget):
         self.open_button.clicked.connect(self.open_csv)
         self.open_recent = QPushButton("Open Latest Sample")
         self.open_recent.clicked.connect(self.open_last_sample)
+        self.stream_psd_button = QPushButton("Stream PSD")
+        self.stream_psd_button.clicked.connect(self.stream_psd)
 
         button_grid = QGridLayout()
         button_grid.addWidget(self.export_button, 0, 0)
         button_grid.addWidget(self.open_button, 0, 1)
         button_grid.addWidget(self.open_recent, 1, 0)
         button_grid.addWidget(self.toggle_button, 1, 1)
+        button_grid.addWidget(self.stream_psd_button, 2, 0, 1, 2)
         left_layout.addLayout(button_grid)
 
         # --------------------
@@ -271,6 +532,27 @@ class PlotFFT(QWidget):
         self.freq_info_label = QLabel("Freq: -- Hz\n1/dt: -- Hz")
         self.freq_info_label.setAlignment(Qt.AlignCenter)
         right_layout.addWidget(self.freq_info_label)
+        right_layout.addWidget(QLabel("Detected Hits:"))
+        self.hit_list_widget = QListWidget()
+        self.hit_list_widget.setMinimumWidth(125)
+        self.hit_list_widget.itemSelectionChanged.connect(self.select_hit)
+        right_layout.addWidget(self.hit_list_widget)
+        self.analyze_hits_button = QPushButton("Analyze All Hits")
+        self.analyze_hits_button.clicked.connect(self.analyze_all_hits)
+        right_layout.addWidget(self.analyze_hits_button)
+        self.average_mode_selection = QComboBox()
+        self.average_mode_selection.addItem("Average Magnitudes", "magnitude")
+        self.average_mode_selection.addItem("Average Cross-Spectra", "cross")
+        right_layout.addWidget(self.average_mode_selection)
+        self.average_hits_button = QPushButton("Average Hits")
+        self.average_hits_button.clicked.connect(self.average_hits)
+        right_layout.addWidget(self.average_hits_button)
+        self.frf_button = QPushButton("FRF / Coherence")
+        self.frf_button.clicked.connect(self.analyze_frf)
+        right_layout.addWidget(self.frf_button)
+        self.fdd_button = QPushButton("FDD Modes")
+        self.fdd_button.clicked.connect(self.analyze_fdd)
+        right_layout.addWidget(self.fdd_button)
 
         main_layout.addLayout(left_layout, 3)
         main_layout.addLayout(right_layout, 1)
@@ -330,8 +612,305 @@ class PlotFFT(QWidget):
         print(f"Padding Factor updated to: {self.padding_factor}")
         self.update_plot()
 
+    def update_precision(self, precision):
+        self.precision = precision
+        print(f"Analysis precision updated to: {self.precision}")
+        dtype = PRECISIONS[precision][0]
+        # A running job may still be reading the columns rewritten below
+        self.plot_runner.cancel()
+        self.plot_runner.wait()
+        self.resampled_cache.clear()
+        self.segment_cache.clear()
+        # Convert already loaded data so memory traffic drops without reopening files
+        for dataset in self.datasets:
+            for column in ACCEL_COLUMNS:
+                if column in dataset.columns:
+                    dataset[column] = dataset[column].astype(dtype)
+        self.update_plot()
+
+    def segment_datasets(self):
+        # Runs once per load: every impact in every file becomes a selectable segment
+        self.hit_segments = []
+        self.hit_list_widget.clear()
+        for i, dataset in enumerate(self.datasets):
+            for hit_number, (start, end) in enumerate(segment_recording(dataset), start=1):
+                self.hit_segments.append((i, start, end))
+                self.hit_list_widget.addItem("D{} Hit {}: {:.3f}-{:.3f} s".format(
+                    i + 1, hit_number, start / 1e6, end / 1e6))
+        print(f"Detected {len(self.hit_segments)} hits across {len(self.datasets)} datasets.")
+
+    def select_hit(self):
+        rows = [self.hit_list_widget.row(item) for item in self.hit_list_widget.selectedItems()]
+        if not rows:
+            return
+        _, start, end = self.hit_segments[rows[0]]
+        self.start_time_slider.setValue(int(np.floor(start / self.SLIDER_CONVERSION)))
+        self.end_time_slider.setValue(int(np.ceil(end / self.SLIDER_CONVERSION)))
+        # The region takes the exact hit bounds; the sliders can only show them rounded
+        self.region_window = (start, end)
+        self.sync_region()
+        self.update_plot()
+
+    def hit_samples(self, selected_axis):
+        # Groups the selected sensor/axis samples of every hit by dataset, with that dataset's dt
+        dtype = PRECISIONS[self.precision][0]
+        grouped = {}
+        for dataset_index, start, end in self.hit_segments:
+            data = self.filter_data(self.datasets[dataset_index])
+            if data.empty:
+                continue
+            time_values = data['Time [microseconds]'].to_numpy()
+            lo, hi = np.searchsorted(time_values, [start, end], side="left")
+            if hi - lo < MIN_ANALYSIS_SAMPLES:
+                continue
+            dt = np.median(np.diff(time_values)) * 1e-6
+            accel_data = data[selected_axis].to_numpy(dtype=dtype)[lo:hi]
+            entry = grouped.setdefault(dataset_index, {'dt': dt, 'segments': [], 'hits': []})
+            entry['segments'].append(accel_data)
+            entry['hits'].append((start, end))
+        return grouped
+
+    def analyze_all_hits(self):
+        # Views drawn directly must not be overwritten by a pending update_plot result
+        self.plot_runner.cancel()
+        if not self.hit_segments:
+            print("No hits detected in the loaded datasets.")
+            return
+        selected_axis = self.axis_selection.currentText()
+        processed = []
+        # One batched transform per file (hits in a file share a sample rate)
+        for dataset_index, entry in self.hit_samples(selected_axis).items():
+            freqs, magnitudes, info = batch_spectra(entry['segments'], entry['dt'], self.padding_factor,
+                                                    self.precision)
+            for row in magnitudes:
+                positive_freqs, positive_magnitudes = normalize_spectrum(freqs, row.copy(),
+                                                                         max_frequency=self.max_frequency)
+                processed.append({
+                    'positive_freqs': positive_freqs,
+                    'positive_magnitudes': positive_magnitudes,
+                    'dt': entry['dt'],
+                    'analysis_info': info
+                })
+        if not processed:
+            print("No hit segments long enough for the selected accelerometer.")
+            return
+        self.datasets_freq_data = processed
+        plot_frequency_data(
+            processed,
+            self.plot_widget_fft,
+            self.freq_list_widget,
+            self.tolerance_slider.value(),
+            self.DATASET_COLORS,
+            selected_axis,
+            self.accel_id_selection.currentText(),
+            self.plot_mode,
+            self.freq_info_label,
+            self.peak_min_snr
+        )
+
+    def average_hits(self):
+        # Ensemble average of every hit in every loaded file for the selected sensor/axis
+        self.plot_runner.cancel()
+        selected_axis = self.axis_selection.currentText()
+        segments, dts = [], []
+        for entry in self.hit_samples(selected_axis).values():
+            segments.extend(entry['segments'])
+            dts.extend([entry['dt']] * len(entry['segments']))
+        if len(segments) < 2:
+            print("At least two hits are needed for averaging.")
+            return
+        mode = self.average_mode_selection.currentData()
+        result = ensemble_spectra(segments, dts, self.padding_factor, self.precision, mode)
+
+        # Same 0-1000 scaling as normalize_spectrum, applied to the spread as well
+        valid_indices = spectrum_band_mask(result['freqs'], max_frequency=self.max_frequency)
+        positive_freqs = result['freqs'][valid_indices]
+        mean_spectrum = result['mean'][valid_indices]
+        floor = mean_spectrum.min()
+        span = max(mean_spectrum.max() - floor, np.finfo(mean_spectrum.dtype).tiny)
+        positive_magnitudes = (mean_spectrum - floor) / span * 1000
+        spread = np.sqrt(result['variance'][valid_indices]) / span * 1000
+
+        self.datasets_freq_data = [{
+            'positive_freqs': positive_freqs,
+            'positive_magnitudes': positive_magnitudes,
+            'dt': result['dt'],
+            'analysis_info': result['info']
+        }]
+        plot_frequency_data(
+            self.datasets_freq_data,
+            self.plot_widget_fft,
+            self.freq_list_widget,
+            self.tolerance_slider.value(),
+            self.DATASET_COLORS,
+            selected_axis,
+            self.accel_id_selection.currentText(),
+            self.plot_mode,
+            self.freq_info_label,
+            self.peak_min_snr
+        )
+        upper = pg.PlotDataItem(positive_freqs, positive_magnitudes + spread, pen=None)
+        lower = pg.PlotDataItem(positive_freqs, positive_magnitudes - spread, pen=None)
+        self.plot_widget_fft.addItem(upper)
+        self.plot_widget_fft.addItem(lower)
+        self.plot_widget_fft.addItem(pg.FillBetweenItem(upper, lower, brush=pg.mkBrush(37, 65, 178, 80)))
+        self.plot_widget_fft.setTitle("Accelerometer {}: {} ({} hits, {})".format(
+            self.accel_id_selection.currentText(), selected_axis, result['hits'],
+            self.average_mode_selection.currentText()))
+
+    def frf_frames(self, dataset_index, channel_data):
+        # Hits inside the window are the averaging frames (unwindowed, so each impulse is kept)
+        # when there are several; otherwise the window is split into Hann-windowed Welch segments
+        time_values = channel_data['time']
+        hits = [(start, end) for index, start, end in self.hit_segments
+                if index == dataset_index and start >= time_values[0] and end <= time_values[-1]]
+        if len(hits) > 1:
+            starts = np.searchsorted(time_values, [start for start, _ in hits])
+            ends = np.searchsorted(time_values, [end for _, end in hits])
+            length = int(np.min(ends - starts))
+            if length >= MIN_ANALYSIS_SAMPLES:
+                rows = starts[:, np.newaxis] + np.arange(length)
+                return channel_data['force'][rows], channel_data['channels'][:, rows], "boxcar"
+        frame_length = min(self.fixed_length, len(time_values))
+        return channel_frames(channel_data['force'], channel_data['channels'], frame_length) + ("hann",)
+
+    def analyze_frf(self):
+        # H1 of the selected sensor/axis for each dataset, with its coherence on the same axes
+        self.plot_runner.cancel()
+        if not self.datasets:
+            print("No data to analyze.")
+            return
+        selected_axis = self.axis_selection.currentText()
+        selected_accel = self.accel_id_selection.currentText()
+        start_time, end_time = self.current_time_window()
+        self.frf_results = []
+        processed = []
+        coherence_curves = []
+        for dataset_index, dataset in enumerate(self.datasets):
+            channel_data = sensor_channels(dataset, start_time, end_time)
+            if channel_data is None or channel_data['force'] is None:
+                print(f"Dataset {dataset_index + 1} has no force channel in the selected range.")
+                continue
+            force_frames, response_frames, window = self.frf_frames(dataset_index, channel_data)
+            result = compute_frf(force_frames, response_frames, channel_data['dt'], self.padding_factor,
+                                 self.precision, window)
+            result['labels'] = channel_data['labels']
+            self.frf_results.append(result)
+            if (selected_accel, selected_axis) not in result['labels']:
+                continue
+            channel = result['labels'].index((selected_accel, selected_axis))
+            positive_freqs, positive_magnitudes = normalize_spectrum(result['freqs'], np.abs(result['h1'][channel]),
+                                                                     max_frequency=self.max_frequency)
+            valid_indices = spectrum_band_mask(result['freqs'], max_frequency=self.max_frequency)
+            coherence_curves.append((positive_freqs, result['coherence'][channel][valid_indices] * 1000))
+            processed.append({
+                'positive_freqs': positive_freqs,
+                'positive_magnitudes': positive_magnitudes,
+                'dt': result['dt'],
+                'analysis_info': result['info']
+            })
+        if not processed:
+            print("No FRF available for the selected accelerometer.")
+            return
+        self.datasets_freq_data = processed
+        plot_frequency_data(
+            processed,
+            self.plot_widget_fft,
+            self.freq_list_widget,
+            self.tolerance_slider.value(),
+            self.dataset_colors,
+            selected_axis,
+            selected_accel,
+            self.plot_mode,
+            self.freq_info_label,
+            self.peak_min_snr
+        )
+        for i, (positive_freqs, coherence) in enumerate(coherence_curves):
+            pen = pg.mkPen(color=self.dataset_colors[i % len(self.dataset_colors)], width=1, style=Qt.DashLine)
+            self.plot_widget_fft.plot(positive_freqs, coherence, pen=pen, name=f"Coherence x1000 (Dataset {i + 1})")
+        self.plot_widget_fft.setTitle(f"Accelerometer {selected_accel}: {selected_axis} (|H1| and Coherence)")
+
+    def analyze_fdd(self):
+        # First singular value of the all-channel CSD matrix per dataset; peaks are modes and
+        # hovering a listed frequency shows its mode shape
+        self.plot_runner.cancel()
+        if not self.datasets:
+            print("No data to analyze.")
+            return
+        start_time, end_time = self.current_time_window()
+        self.fdd_results = []
+        for dataset in self.datasets:
+            result = decompose_recording(dataset, self.padding_factor, self.precision, self.fixed_length,
+                                         start_time, end_time, self.max_frequency)
+            if result is not None:
+                self.fdd_results.append(result)
+        if not self.fdd_results:
+            print("Not enough multi-channel data in the selected range for FDD.")
+            return
+        self.datasets_freq_data = [result['spectrum'] for result in self.fdd_results]
+        plot_frequency_data(
+            self.datasets_freq_data,
+            self.plot_widget_fft,
+            self.freq_list_widget,
+            self.tolerance_slider.value(),
+            self.dataset_colors,
+            "All Axes",
+            "All",
+            self.plot_mode,
+            self.freq_info_label,
+            self.peak_min_snr
+        )
+        result = self.fdd_results[0]
+        positive_freqs = result['spectrum']['positive_freqs']
+        for row in range(self.freq_list_widget.count()):
+            item = self.freq_list_widget.item(row)
+            index = np.argmin(np.abs(positive_freqs - float(item.text().split()[0])))
+            item.setToolTip("\n".join("S{} {}: {:+.3f}".format(sensor_id, axis[0], value) for (sensor_id, axis), value
+                                      in zip(result['labels'], result['band_shapes'][index].real)))
+        self.plot_widget_fft.setTitle("First Singular Value, {} channels (FDD)".format(len(result['labels'])))
+
+    def update_resampling(self):
+        self.resample_enabled = self.resample_checkbox.isChecked()
+        print(f"Uniform resampling {'enabled' if self.resample_enabled else 'disabled'}")
+        self.update_plot()
+
+    def update_waterfall(self):
+        self.waterfall_enabled = self.waterfall_checkbox.isChecked()
+        self.update_plot()
+
+    def on_fft_clicked(self, event):
+        # In the waterfall, clicking a row names the capture it came from
+        if not self.waterfall_enabled or not self.datasets_freq_data:
+            return
+        point = self.plot_widget_fft.getPlotItem().vb.mapSceneToView(event.scenePos())
+        row = int(np.floor(point.y()))
+        if 0 <= row < len(self.datasets_freq_data):
+            dataset_index = self.datasets_freq_data[row].get('dataset_index')
+            name = self.dataset_names.get(dataset_index, f"Dataset {row + 1}")
+            self.plot_widget_fft.setTitle(f"Row {row + 1}: {name}")
+            print(f"Waterfall row {row + 1}: {name}")
+
+    def update_max_frequency(self):
+        self.max_frequency = self.max_frequency_selection.currentData()
+        print(f"Max frequency of interest updated to: {self.max_frequency}")
+        self.update_plot()
+
+    def analysis_options(self):
+        # Keyword arguments for process_frequency_data shared with DataRecorder
+        return {
+            'length_strategy': self.length_strategy,
+            'fixed_length': self.fixed_length,
+            'precision': self.precision,
+            'max_frequency': self.max_frequency,
+        }
+
+    def update_length_strategy(self):
+        self.length_strategy = self.strategy_selection.currentData()
+        print(f"Analysis length strategy updated to: {self.length_strategy}")
+        self.update_plot()
+
     def open_last_sample(self):
-        import os, re
+        import re
         directory = "../Cached_Samples/"
         pattern = r"samples_\d{8}_\d{6}\.csv"
         files = [f for f in os.listdir(directory) if re.match(pattern, f)]
@@ -341,18 +920,27 @@ class PlotFFT(QWidget):
 
         newest_file = max([os.path.join(directory, f) for f in files], key=os.path.getmtime)
         print(f"Opening newest file: {newest_file}")
+        self.file_loader.cancel()  # Files still loading from an earlier Open CSV are superseded
+        self.plot_runner.cancel()
+        self.loaded_datasets = {}
+        self.sensor_indexes.clear()
         data = self.load_data(newest_file, dataset_index=0)
+        self.dataset_names = {0: os.path.basename(newest_file)}
         if not data.empty:
             if 'Accelerometer ID' in data.columns:
-                unique_ids = sorted(data['Accelerometer ID'].astype(str).unique())
+                unique_ids = self.sensor_index(data).sensor_ids()
                 self.accel_id_selection.clear()
                 self.accel_id_selection.addItems(unique_ids)
                 if unique_ids:
                     self.accel_id_selection.setCurrentIndex(0)
+            self.resampled_cache.clear()
+            self.segment_cache.clear()
+            self.pyramid_cache.clear()
             data_filtered = self.filter_data(data)
             if not data_filtered.empty:
                 self.datasets = [data_filtered]
                 self.dataset_colors = [pg.intColor(0)]
+                self.segment_datasets()
                 self.setup_sliders()
                 self.plot_time_domain(self.datasets)
                 self.plot_frequency_domain(self.datasets)
@@ -361,17 +949,63 @@ class PlotFFT(QWidget):
         else:
             print("No data loaded from file.")
 
+    def stream_psd(self):
+        # Welch PSD over a whole recording, read block by block so file length does not matter
+        self.plot_runner.cancel()
+        file_path, _ = QFileDialog.getOpenFileName(self, "Stream PSD From CSV", "", "CSV Files (*.csv)")
+        if not file_path:
+            return
+        selected_axis = self.axis_selection.currentText()
+        selected_accel = self.accel_id_selection.currentText()
+        start = time.perf_counter()
+        try:
+            accumulator = stream_psd_from_csv(file_path, selected_accel, selected_axis,
+                                              nperseg=self.fixed_length, padding_factor=self.padding_factor,
+                                              precision=self.precision)
+        except (ValueError, KeyError, OSError) as e:
+            print(f"Error streaming PSD: {e}")
+            return
+        freqs, psd = accumulator.psd()
+        dtype = PRECISIONS[self.precision][0]
+        positive_freqs, positive_magnitudes = normalize_spectrum(freqs.astype(dtype), np.sqrt(psd).astype(dtype))
+        print(f"Streamed {accumulator.samples_seen} samples into {accumulator.segments} segments.")
+        self.datasets_freq_data = [{
+            'positive_freqs': positive_freqs,
+            'positive_magnitudes': positive_magnitudes,
+            'dt': 1 / accumulator.fs,
+            'analysis_info': analysis_info("averaged", self.precision, accumulator.samples_seen, accumulator.segments,
+                                           accumulator.nperseg, accumulator.nfft, 1 / accumulator.fs, start)
+        }]
+        plot_frequency_data(
+            self.datasets_freq_data,
+            self.plot_widget_fft,
+            self.freq_list_widget,
+            self.tolerance_slider.value(),
+            self.dataset_colors or ['#2541B2'],
+            selected_axis,
+            selected_accel,
+            "PSD",
+            self.freq_info_label,
+            self.peak_min_snr
+        )
+
     def toggle_plot(self):
         self.plot_mode = "PSD" if self.plot_mode == "FFT" else "FFT"
         self.toggle_button.setText("Show FFT" if self.plot_mode == "PSD" else "Show PSD")
         self.update_plot()
 
+    def current_time_window(self):
+        # (start, end) in µs: the region picked on the time plot, else the sliders
+        if self.region_window is not None:
+            return self.region_window
+        return (self.start_time_slider.value() * self.SLIDER_CONVERSION,
+                self.end_time_slider.value() * self.SLIDER_CONVERSION)
+
     def update_labels(self):
-        start_time = self.start_time_slider.value() * self.SLIDER_CONVERSION
-        end_time = self.end_time_slider.value() * self.SLIDER_CONVERSION
+        start_time, end_time = self.current_time_window()
         tolerance_value = self.tolerance_slider.value()
-        self.start_time_label.setText(f"Start Time: {start_time} µs")
-        self.end_time_label.setText(f"End Time: {end_time} µs")
+        self.start_time_label.setText(f"Start Time: {start_time:.0f} µs")
+        self.end_time_label.setText(f"End Time: {end_time:.0f} µs")
         self.tolerance_label.setText(f"Tolerance: {tolerance_value} dB")
 
     def export_data(self):
@@ -380,93 +1014,83 @@ class PlotFFT(QWidget):
             return
 
         file_dialog = QFileDialog()
-        file_base_path, _ = file_dialog.getSaveFileName(self, "Save CSV", "", "CSV Files (*.csv)")
+        file_base_path, selected_filter = file_dialog.getSaveFileName(
+            self, "Save CSV", "", "CSV Files (*.csv);;Single NumPy archive (*.npz)")
         if file_base_path:
-            for i, trimmed_data in enumerate(self.datasets_filtered):
-                if trimmed_data.empty:
-                    continue
-                start_time = self.start_time_slider.value()
-                end_time = self.end_time_slider.value()
-                trimmed_data_in_range = trimmed_data[
-                    (trimmed_data['Time [microseconds]'] >= start_time * self.SLIDER_CONVERSION) &
-                    (trimmed_data['Time [microseconds]'] <= end_time * self.SLIDER_CONVERSION)
-                ]
-                if trimmed_data_in_range.empty:
-                    print(f"No data in range for Dataset {i + 1}.")
-                    continue
-                trimmed_data_path = f"{file_base_path}_Dataset_{i + 1}_trimmed_data.csv"
-                trimmed_data_in_range.to_csv(trimmed_data_path, index=False)
-                print(f"Dataset {i + 1} trimmed data exported to {trimmed_data_path}.")
-
-            if self.datasets_freq_data:
-                for i, freq_data in enumerate(self.datasets_freq_data):
-                    positive_freqs = freq_data['positive_freqs']
-                    positive_magnitudes = freq_data['positive_magnitudes']
-                    positive_magnitudes_dB = 20 * np.log10(positive_magnitudes)
-                    freq_magnitude_data = pd.DataFrame({
-                        "Frequency (Hz)": positive_freqs,
-                        "Magnitude (dB)": positive_magnitudes_dB
-                    })
-                    freq_magnitude_path = f"{file_base_path}_Dataset_{i + 1}_frequency_magnitude.csv"
-                    freq_magnitude_data.to_csv(freq_magnitude_path, index=False)
-                    print(f"Dataset {i + 1} frequency data exported to {freq_magnitude_path}.")
-            else:
-                print("Frequency data unavailable for export.")
-
-            if hasattr(self, 'freq_list_widget'):
-                selected_items = self.freq_list_widget.selectedItems()
-                if selected_items:
-                    selected_freqs = [float(item.text().split()[0]) for item in selected_items]
-                    selected_natural_freqs, selected_magnitudes = [], []
-                    for freq in selected_freqs:
-                        for freq_data in self.datasets_freq_data:
-                            positive_freqs = freq_data['positive_freqs']
-                            positive_magnitudes = freq_data['positive_magnitudes']
-                            if len(positive_freqs) == 0:
-                                continue
-                            idx = np.abs(positive_freqs - freq).argmin()
-                            selected_natural_freqs.append(positive_freqs[idx])
-                            selected_magnitudes.append(positive_magnitudes[idx])
-                    if selected_natural_freqs and selected_magnitudes:
-                        selected_magnitudes_dB = 20 * np.log10(selected_magnitudes)
-                        natural_freq_data = pd.DataFrame({
-                            "Natural Frequency (Hz)": selected_natural_freqs,
-                            "Magnitude (dB)": selected_magnitudes_dB
-                        })
-                        natural_freq_path = f"{file_base_path}_selected_natural_frequencies.csv"
-                        natural_freq_data.to_csv(natural_freq_path, index=False)
-                        print(f"Selected frequencies exported to {natural_freq_path}.")
-                    else:
-                        print("No matching natural frequencies found for export.")
-                else:
-                    print("No natural frequencies selected for export.")
-            else:
-                print("Natural frequency data unavailable for export.")
+            compact = file_base_path.endswith(COMPACT_SUFFIX) or selected_filter.endswith("(*.npz)")
+            # Only cheap slicing and the selection happen here; the writing runs in the background.
+            # Samples go out as recorded: resampling is internal to the analysis.
+            window = self.current_time_window()
+            selected_id = self.accel_id_selection.currentText()
+            recorded = [sensor_frame(dataset, self.sensor_index(dataset), selected_id, resample=False)
+                        for dataset in self.datasets if not dataset.empty]
+            trimmed_data = [(i + 1, time_window(data, *window))
+                            for i, data in enumerate(data for data in recorded if not data.empty)]
+            selected_freqs = [float(item.text().split()[0]) for item in self.freq_list_widget.selectedItems()]
+            print(f"Exporting to {file_base_path} in the background...")
+            self.export_runner.submit(
+                self.write_export,
+                file_base_path,
+                trimmed_data,
+                list(self.datasets_freq_data or []),
+                selected_freqs,
+                self.tolerance_slider.value(),
+                self.peak_min_snr,
+                compact,
+                callback=lambda written: print(f"Export to {file_base_path} finished: "
+                                               f"{len(written)} file(s) written.")
+            )
 
-    def plot_time_domain(self, datasets_filtered):
-        self.plot_widget_time.clear()
-        if hasattr(self, 'time_legend'):
-            self.plot_widget_time.removeItem(self.time_legend)
-            del self.time_legend
-        self.time_legend = self.plot_widget_time.addLegend()
+    def write_export(self, file_base_path, trimmed_data, processed_data, selected_freqs, tolerance, min_snr,
+                     compact):
+        # Worker-thread half of export_data. Log-decrement damping needs the time signals, so
+        # the peaks are only detected here, and only when there are selected frequencies.
+        peak_tables = []
+        if selected_freqs and processed_data:
+            peak_tables = detect_peaks_all(processed_data, tolerance, min_snr, log_decrement=True)
+        return export_results(file_base_path, trimmed_data, processed_data, peak_tables, selected_freqs,
+                              compact)
+
+    def time_pyramid(self, data, selected_axis, previous):
+        # Built once per per-sensor frame and axis; panning and zooming reuse it
+        key = (id(data), selected_axis, self.precision)
+        cached = previous.get(key)
+        if cached is None or cached[0] is not data:
+            time = data['Time [microseconds]'].to_numpy() / 1e6  # Convert µs to s
+            accel_data = data[selected_axis].to_numpy(dtype=PRECISIONS[self.precision][0])
+            cached = (data, MinMaxPyramid(time, accel_data))
+        self.pyramid_cache[key] = cached
+        return cached[1]
 
-        for i, data_filtered in enumerate(datasets_filtered):
-            if not data_filtered.empty:
-                time = data_filtered['Time [microseconds]'].to_numpy() / 1e6  # Convert µs to s
-                selected_axis = self.axis_selection.currentText()
-                selected_accel = self.accel_id_selection.currentText()
-                accel_data = 9.8124 * data_filtered[selected_axis].to_numpy()
-                pen = pg.mkPen(color=self.dataset_colors[i], width=1)
-                self.plot_widget_time.plot(time, accel_data, pen=pen,
-                                           name=f"{selected_axis} - Accel {selected_accel} (Dataset {i + 1})")
-        if datasets_filtered:
-            selected_axis = self.axis_selection.currentText()
-            selected_accel = self.accel_id_selection.currentText()
+    def plot_time_domain(self, datasets_filtered):
+        # Each dataset in full, with the analysed window marked by the region. Curves are re-pointed
+        # at the new data in place; they and the legend are only rebuilt when the datasets change.
+        if not hasattr(self, 'time_legend'):
+            self.time_legend = self.plot_widget_time.addLegend()
+        selected_axis = self.axis_selection.currentText()
+        selected_accel = self.accel_id_selection.currentText()
+        previous_pyramids, self.pyramid_cache = self.pyramid_cache, {}  # Keep only what is drawn now
+        sources = [(i, self.time_pyramid(data_filtered, selected_axis, previous_pyramids))
+                   for i, data_filtered in enumerate(datasets_filtered) if not data_filtered.empty]
+        layout = [(f"{selected_axis} - Accel {selected_accel} (Dataset {i + 1})", self.dataset_colors[i])
+                  for i, _ in sources]
+        if layout != self.time_layout:
+            for curve in self.time_curves:
+                self.plot_widget_time.removeItem(curve)
+            self.time_curves = []
+            for (name, color), (_, pyramid) in zip(layout, sources):
+                curve = DecimatedCurve(pyramid, pen=pg.mkPen(color=color, width=1), name=name)
+                self.plot_widget_time.addItem(curve)
+                self.time_curves.append(curve)
+            self.time_layout = layout
+        else:
+            for curve, (_, pyramid) in zip(self.time_curves, sources):
+                curve.set_source(pyramid)
+        if sources:
             self.plot_widget_time.setLabel('left', 'Acceleration (m/s²)')
             self.plot_widget_time.setLabel('bottom', 'Time (s)')
             self.plot_widget_time.setTitle(f"Accelerometer {selected_accel}: {selected_axis} (Time Domain)")
         else:
-            self.plot_widget_time.clear()
             self.plot_widget_time.setTitle("No Data Loaded")
 
     def plot_frequency_domain(self, datasets):
@@ -475,7 +1099,8 @@ class PlotFFT(QWidget):
             datasets,
             self.axis_selection.currentText(),
             self.padding_factor,
-            self.plot_mode
+            self.plot_mode,
+            **self.analysis_options()
         )
         self.datasets_freq_data = processed  # Ensure this is available for update_selected_frequencies
         plot_frequency_data(
@@ -487,41 +1112,77 @@ class PlotFFT(QWidget):
             self.axis_selection.currentText(),
             self.accel_id_selection.currentText(),
             self.plot_mode,
-            self.freq_info_label
+            self.freq_info_label,
+            self.peak_min_snr
         )
 
     def open_csv(self):
         file_dialog = QFileDialog()
         file_paths, _ = file_dialog.getOpenFileNames(self, "Open CSV Files", "", "CSV Files (*.csv)")
         if file_paths:
+            self.file_loader.cancel()  # Files still loading from an earlier Open CSV are superseded
+            self.plot_runner.cancel()
             self.datasets = []
+            self.loaded_datasets = {}
+            self.dataset_names = {i: os.path.basename(file_path) for i, file_path in enumerate(file_paths)}
+            self.sensor_indexes.clear()
+            self.resampled_cache.clear()
+            self.segment_cache.clear()
+            self.pyramid_cache.clear()
             self.dataset_colors = []  # Reinitialize to avoid index errors
-            all_unique_ids = set()
-            colors = ['#2541B2', '#D8973C', '#34A5DA', '#F7F5FB', '#A14A44', '#44A1A0']
+            self.accel_id_selection.clear()
+            # Files with a sidecar cache, and small batches of CSVs, load here in milliseconds;
+            # worker processes only pay for their start-up on large batches to parse. Datasets
+            # appear one by one as their files finish loading.
+            dtype = PRECISIONS[self.precision][0]
+            uncached = [i for i, file_path in enumerate(file_paths) if not has_fresh_cache(file_path)]
+            uncached_bytes = sum(os.path.getsize(file_paths[i]) for i in uncached if os.path.exists(file_paths[i]))
+            large = len(uncached) >= self.MIN_POOLED_FILES and uncached_bytes >= self.MIN_POOLED_BYTES
+            self.pooled_files = uncached if large else []
+            if self.pooled_files:
+                self.file_loader.map(load_sample, [(file_paths[i], i, dtype) for i in self.pooled_files])
             for i, file_path in enumerate(file_paths):
-                data = self.load_data(file_path, i)
-                if not data.empty:
-                    self.datasets.append(data)
-                    self.dataset_colors.append(colors[i % len(colors)])
-                    if 'Accelerometer ID' in data.columns:
-                        all_unique_ids.update(map(str, data['Accelerometer ID'].unique()))
-            if self.datasets:
-                sorted_ids = sorted(all_unique_ids)
-                self.accel_id_selection.clear()
-                self.accel_id_selection.addItems(sorted_ids)
-                self.filter_and_plot_all()
-            else:
-                print("No valid data loaded from selected files.")
+                if i not in self.pooled_files:
+                    self.add_dataset(i, self.load_data(file_path, i))
+            if not self.pooled_files:
+                self.finish_loading()
+
+    def on_file_loaded(self, job_index, result):
+        file_index = self.pooled_files[job_index]
+        data, index = result
+        self.sensor_indexes[id(data)] = index
+        self.add_dataset(file_index, data)
+
+    def add_dataset(self, file_index, data):
+        if data.empty:
+            return
+        self.loaded_datasets[file_index] = data
+        # Datasets keep the order the files were picked in, whatever order they finish in
+        colors = self.DATASET_COLORS
+        order = sorted(self.loaded_datasets)
+        self.datasets = [self.loaded_datasets[i] for i in order]
+        self.dataset_colors = [colors[i % len(colors)] for i in order]
+        sensor_ids = sorted({sensor_id for dataset in self.datasets
+                             for sensor_id in self.sensor_index(dataset).sensor_ids()})
+        current_id = self.accel_id_selection.currentText()
+        self.accel_id_selection.blockSignals(True)
+        self.accel_id_selection.clear()
+        self.accel_id_selection.addItems(sensor_ids)
+        if current_id in sensor_ids:
+            self.accel_id_selection.setCurrentText(current_id)
+        self.accel_id_selection.blockSignals(False)
+        self.filter_and_plot_all()
+
+    def finish_loading(self):
+        if self.datasets:
+            self.segment_datasets()
+        else:
+            print("No valid data loaded from selected files.")
 
     def load_data(self, file_path, dataset_index):
         try:
-            data = pd.read_csv(file_path)
-            if not data['Time [microseconds]'].is_monotonic_increasing:
-                print("Warning: Time data is not monotonic. Sorting may affect interpretation.")
-            data = data.sort_values(by='Time [microseconds]')
-            min_time = data['Time [microseconds]'].min()
-            data['Time [microseconds]'] -= min_time
-            data['Dataset Index'] = dataset_index
+            data, index = load_sample(file_path, dataset_index, PRECISIONS[self.precision][0])
+            self.sensor_indexes[id(data)] = index
             return data
         except Exception as e:
             print(f"Error loading data: {e}")
@@ -531,25 +1192,37 @@ class PlotFFT(QWidget):
         if not self.datasets:
             print("No datasets loaded to filter and plot.")
             return
-        datasets_filtered = [self.filter_data(dataset) for dataset in self.datasets]
-        self.datasets_filtered = [df for df in datasets_filtered if not df.empty]
-        if not self.datasets_filtered:
-            print("No data available after filtering for selected Accelerometer ID.")
-            self.plot_time_domain([])
-            self.plot_frequency_domain([])
-            self.freq_list_widget.clear()
-            return
+        # The per-sensor frames (and their resampling) are built by the plot worker, which
+        # reports when the selected sensor has no data
         self.setup_sliders()
         self.update_plot()
 
-    def filter_data(self, dataset):
+    def sensor_index(self, dataset):
+        # Built once per loaded dataset (load_data leaves it grouped by sensor)
+        index = self.sensor_indexes.get(id(dataset))
+        if index is None or index.data is not dataset:
+            index = self.sensor_indexes[id(dataset)] = SensorIndex(dataset)
+        return index
+
+    def filter_data(self, dataset, selected_id=None):
         if dataset.empty:
             return pd.DataFrame()
-        selected_id = self.accel_id_selection.currentText()
-        if selected_id and 'Accelerometer ID' in dataset.columns:
-            newdata = dataset[dataset['Accelerometer ID'].astype(str) == selected_id]
-            return newdata if not newdata.empty else pd.DataFrame()
-        return dataset
+        if selected_id is None:
+            selected_id = self.accel_id_selection.currentText()
+        # Per-sensor frames are cached either way so later caches can key on their identity
+        cached = self.cached_sensor_frame(dataset, selected_id)
+        if cached is not None:
+            return cached
+        newdata = sensor_frame(dataset, self.sensor_index(dataset), selected_id, self.resample_enabled)
+        self.resampled_cache[(id(dataset), selected_id, self.resample_enabled)] = (dataset, newdata)
+        return newdata
+
+    def cached_sensor_frame(self, dataset, selected_id):
+        # The entry must belong to this very dataset; ids of freed frames get reused
+        cached = self.resampled_cache.get((id(dataset), selected_id, self.resample_enabled))
+        if cached is not None and cached[0] is dataset:
+            return cached[1]
+        return None
 
     def setup_sliders(self):
         min_time_global = float('inf')
@@ -559,14 +1232,17 @@ class PlotFFT(QWidget):
             self.end_time_slider.setRange(0, 100)
             self.start_time_slider.setValue(0)
             self.end_time_slider.setValue(100)
+            self.region_window = None
             self.update_labels()
+            self.sync_region()
             print("No datasets loaded to setup sliders.")
             return
         for dataset in self.datasets:
             if not dataset.empty:
+                # Rows are grouped by sensor, so the first and last rows are not the time extremes
                 time_values = dataset['Time [microseconds]'].to_numpy() / self.SLIDER_CONVERSION
-                min_time_dataset = int(time_values[0])
-                max_time_dataset = int(time_values[-1])
+                min_time_dataset = int(time_values.min())
+                max_time_dataset = int(time_values.max())
                 min_time_global = min(min_time_global, min_time_dataset)
                 max_time_global = max(max_time_global, max_time_dataset)
         if min_time_global != float('inf'):
@@ -580,45 +1256,252 @@ class PlotFFT(QWidget):
             self.start_time_slider.setValue(0)
             self.end_time_slider.setValue(100)
             print("No valid time data found in datasets for sliders.")
+        self.region_window = None
         self.update_labels()
+        self.time_region.setBounds((self.start_time_slider.minimum() * self.SLIDER_CONVERSION / 1e6,
+                                    (self.end_time_slider.maximum() + 1) * self.SLIDER_CONVERSION / 1e6))
+        self.sync_region()
 
     def on_slider_value_changed(self, value):
-        self.update_labels()
         sender = self.sender()
-        if not sender.isSliderDown():
+        self.update_labels()
+        if sender is self.tolerance_slider:
+            self.update_peaks()
+            return
+        self.region_window = None
+        self.sync_region()
+        if sender.isSliderDown():
+            self.drag_refined = False
+            if not self.preview_timer.isActive():
+                self.preview_timer.start()
+            self.refine_timer.start()
+        else:
             self.slider_timer.start()
 
     def on_slider_released(self):
+        if self.sender() is self.tolerance_slider:
+            return  # Its peaks are already up to date
         self.slider_timer.stop()
+        self.preview_timer.stop()
+        self.refine_timer.stop()
+        if not self.drag_refined:
+            self.update_plot()
+        self.drag_refined = False
+
+    def sync_region(self):
+        # Moves the region to the current window without treating it as a user drag
+        start_time, end_time = self.current_time_window()
+        self.time_region.blockSignals(True)
+        self.time_region.setRegion((start_time / 1e6, end_time / 1e6))
+        self.time_region.blockSignals(False)
+
+    def on_region_changed(self):
+        # Dragging the region: exact window, sliders follow (quantized) without recomputing
+        start, end = self.time_region.getRegion()
+        self.region_window = (start * 1e6, end * 1e6)
+        for slider, value in ((self.start_time_slider, start), (self.end_time_slider, end)):
+            slider.blockSignals(True)
+            slider.setValue(int(round(value * 1e6 / self.SLIDER_CONVERSION)))
+            slider.blockSignals(False)
+        self.update_labels()
+        self.drag_refined = False
+        if not self.preview_timer.isActive():
+            self.preview_timer.start()
+        self.refine_timer.start()
+
+    def on_region_change_finished(self):
+        self.preview_timer.stop()
+        self.refine_timer.stop()
+        if not self.drag_refined:
+            self.update_plot()
+        self.drag_refined = False
+
+    def refine_plot(self):
+        self.drag_refined = True
         self.update_plot()
 
+    def preview_plot(self):
+        # Coarse pass for slider drags over the same band: no zero padding, single precision, and
+        # a whole-window transform becomes an average of short segments, so there are far fewer
+        # bins to transform, search for peaks and draw
+        options = dict(self.analysis_options(), precision="float32")
+        if options['length_strategy'] == "full":
+            options.update(length_strategy="averaged", fixed_length=PREVIEW_FFT_LENGTH)
+        self.submit_plot(1, options, preview=True)
+
     def _filter_datasets_by_time(self, datasets, start_time, end_time):
-        filtered = [df[(df['Time [microseconds]'] >= start_time) &
-                       (df['Time [microseconds]'] <= end_time)]
-                    for df in datasets]
+        # Per-sensor frames are time-sorted, so each window is a searchsorted slice
+        filtered = [time_window(df, start_time, end_time) for df in datasets]
         return [df for df in filtered if not df.empty]
 
     def update_plot(self):
+        self.submit_plot(self.padding_factor, self.analysis_options())
+
+    def submit_plot(self, padding_factor, options, preview=False):
         if not self.datasets:
             print("No data to plot.")
             return
-        datasets_filtered = [self.filter_data(dataset) for dataset in self.datasets]
-        valid_datasets = [df for df in datasets_filtered if not df.empty]
-        if not valid_datasets:
-            print("No data available for selected accelerometer ID.")
-            self.plot_time_domain([])
-            self.plot_frequency_domain([])
-            self.freq_list_widget.clear()
-            return
-        start_time = self.start_time_slider.value() * self.SLIDER_CONVERSION
-        end_time = self.end_time_slider.value() * self.SLIDER_CONVERSION
         self.update_labels()
+        selected_id = self.accel_id_selection.currentText()
+        # The worker only reads what it is given: datasets with their indexes and the
+        # per-sensor frames already built. What it builds comes back with the result.
+        sources = [(dataset, self.sensor_index(dataset), self.cached_sensor_frame(dataset, selected_id))
+                   for dataset in self.datasets]
+        self.plot_runner.submit(
+            self.compute_plot_data,
+            sources,
+            selected_id,
+            self.resample_enabled,
+            dict(self.segment_cache),
+            self.axis_selection.currentText(),
+            *self.current_time_window(),
+            padding_factor,
+            self.plot_mode,
+            options,
+            self.tolerance_slider.value(),
+            self.peak_min_snr,
+            callback=partial(self.draw_plot_data, preview=preview)
+        )
+
+    def compute_plot_data(self, sources, selected_id, resample, segment_cache, selected_axis, start_time, end_time,
+                          padding_factor, plot_mode, options, tolerance, min_snr, cancelled):
+        # Worker-thread half of update_plot: everything except drawing. It never writes to the
+        # widget's caches; new per-sensor frames and segment spectra are returned for
+        # draw_plot_data to keep. Raises Cancelled between stages once a newer request has
+        # been submitted.
+        valid_datasets = []
+        resampled = {}
+        for dataset, index, data in sources:
+            if cancelled():
+                raise Cancelled()
+            if data is None:
+                data = sensor_frame(dataset, index, selected_id, resample)
+                resampled[(id(dataset), selected_id, resample)] = (dataset, data)
+            if not data.empty:
+                valid_datasets.append(data)
+        if not valid_datasets:
+            return {'message': "No data available for selected accelerometer ID.", 'resampled': resampled}
         time_filtered = self._filter_datasets_by_time(valid_datasets, start_time, end_time)
         if not time_filtered:
-            print("No data in selected time range.")
+            return {'message': "No data in selected time range.", 'sensor_data': valid_datasets,
+                    'resampled': resampled}
+        if cancelled():
+            raise Cancelled()
+        if plot_mode == "FFT" and options['length_strategy'] == "averaged":
+            processed, segment_cache = self.cached_frequency_data(valid_datasets, selected_axis, start_time, end_time,
+                                                                  padding_factor, options, segment_cache)
+        else:
+            processed = process_frequency_data(time_filtered, selected_axis, padding_factor, plot_mode, **options)
+        if cancelled():
+            raise Cancelled()
+        return {
+            'sensor_data': valid_datasets,
+            'time_filtered': time_filtered,
+            'processed': processed,
+            'peak_tables': detect_peaks_all(processed, tolerance, min_snr),
+            'resampled': resampled,
+            'segment_cache': segment_cache,
+        }
+
+    def cached_frequency_data(self, sensor_frames, selected_axis, start_time, end_time, padding_factor, options,
+                              segment_cache):
+        # process_frequency_data for the "averaged" FFT, but segment spectra are kept per channel,
+        # so nudging the window only transforms the segments at its edges. Windows the segment
+        # grid cannot serve (decimation, shorter than one segment) take the regular path. The
+        # segment length comes from the options, never the window, so dragging reuses one entry
+        # per channel. Returns the results and the segment cache to keep: channels still on
+        # screen, at most SEGMENT_CACHE_ENTRIES of them.
+        dtype = PRECISIONS[options['precision']][0]
+        results = []
+        frame_ids = {id(data) for data in sensor_frames}
+        segment_cache = {key: cached for key, cached in segment_cache.items() if key[0] in frame_ids}
+        for data in sensor_frames:
+            time_values = data['Time [microseconds]'].to_numpy()
+            lo = int(np.searchsorted(time_values, start_time, side="left"))
+            hi = int(np.searchsorted(time_values, end_time, side="right"))
+            if hi - lo < MIN_ANALYSIS_SAMPLES:
+                continue
+            dt = (time_values[hi - 1] - time_values[lo]) / (hi - lo - 1) * 1e-6
+            spectrum = None
+            if dt > 0 and time_values[hi - 1] >= 1000 and decimation_factor(1 / dt, options['max_frequency']) == 1:
+                key = (id(data), selected_axis, options['fixed_length'], padding_factor, options['precision'])
+                cached = segment_cache.pop(key, None)
+                if cached is None or cached[0] is not data:
+                    cached = (data, SegmentSpectra(options['fixed_length'], padding_factor, options['precision']))
+                segment_cache[key] = cached  # Most recently used last
+                while len(segment_cache) > self.SEGMENT_CACHE_ENTRIES:
+                    del segment_cache[next(iter(segment_cache))]
+                channel = data[selected_axis].to_numpy()
+                spectrum = cached[1].spectrum(channel, lo, hi, dt)
+            if spectrum is None:
+                results.extend(process_frequency_data([data.iloc[lo:hi]], selected_axis, padding_factor, "FFT",
+                                                      **options))
+                continue
+            positive_freqs, positive_magnitudes, analysis_info = spectrum
+            positive_freqs, positive_magnitudes = normalize_spectrum(positive_freqs, positive_magnitudes,
+                                                                     max_frequency=options['max_frequency'])
+            samples = channel[lo:hi].astype(dtype)
+            results.append({
+                'positive_freqs': positive_freqs,
+                'positive_magnitudes': positive_magnitudes,
+                'dt': dt,
+                'analysis_info': analysis_info,
+                'samples': samples - samples.mean(),
+                'dataset_index': data['Dataset Index'].iloc[0] if 'Dataset Index' in data.columns else None
+            })
+        return results, segment_cache
+
+    def draw_plot_data(self, result, preview=False):
+        # Caches built by the worker are kept only for datasets that are still loaded
+        current = {id(dataset): dataset for dataset in self.datasets}
+        self.resampled_cache.update({key: entry for key, entry in result['resampled'].items()
+                                     if current.get(key[0]) is entry[0]})
+        if 'segment_cache' in result:
+            self.segment_cache = result['segment_cache']
+        self.datasets_filtered = result.get('sensor_data', [])
+        if 'message' in result:
+            print(result['message'])
             self.plot_time_domain([])
             self.plot_frequency_domain([])
             self.freq_list_widget.clear()
             return
-        self.plot_time_domain(time_filtered)
-        self.plot_frequency_domain(time_filtered)
+        self.plot_time_domain(result['sensor_data'])
+        self.datasets_freq_data = result['processed']  # Ensure this is available for update_selected_frequencies
+        self.draw_spectra(result['processed'], result['peak_tables'])
+        if preview:
+            self.freq_info_label.setText(self.freq_info_label.text() + "\nPreview: refined when the slider rests")
+
+    def update_peaks(self):
+        # Tolerance only decides which peaks count, so the spectra on screen are kept and only
+        # peak detection runs again
+        if not self.datasets_freq_data:
+            return
+        self.draw_spectra(self.datasets_freq_data,
+                          detect_peaks_all(self.datasets_freq_data, self.tolerance_slider.value(), self.peak_min_snr))
+
+    def draw_spectra(self, processed, peak_tables):
+        if self.waterfall_enabled:
+            plot_waterfall_data(
+                processed,
+                self.plot_widget_fft,
+                self.freq_list_widget,
+                self.axis_selection.currentText(),
+                self.accel_id_selection.currentText(),
+                self.plot_mode,
+                self.freq_info_label,
+                peak_tables
+            )
+        else:
+            plot_frequency_data(
+                processed,
+                self.plot_widget_fft,
+                self.freq_list_widget,
+                self.tolerance_slider.value(),
+                self.dataset_colors,
+                self.axis_selection.currentText(),
+                self.accel_id_selection.currentText(),
+                self.plot_mode,
+                self.freq_info_label,
+                self.peak_min_snr,
+                peak_tables
+            )
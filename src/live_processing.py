@@ -0,0 +1,271 @@
+import numpy as np
+import pandas as pd
+from scipy import fft as sp_fft
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+DEFAULT_HIGHPASS_HZ = 0.5  # Below every structural mode, above gravity and drift
+
+
+class StreamingHighPass:
+    # Butterworth high-pass applied block by block with the filter state carried between
+    # blocks, one filter per key (sensor). Each filter is designed for the rate the key's own
+    # timestamps show, not the requested speed, so interleaved sensors or an output rate that
+    # differs from it keep the true cutoff. Blocks are (n, channels); the state of a new key
+    # starts at steady state for its first sample so gravity does not ring through.
+    def __init__(self, cutoff=DEFAULT_HIGHPASS_HZ, order=2, time_scale=1e-6):
+        self.cutoff = cutoff
+        self.order = order
+        self.time_scale = time_scale
+        self.enabled = True
+        self.reset()
+
+    def reset(self):
+        self.filters = {}  # key -> [sos, state]
+        self.first_samples = {}  # key -> (time, row) of its first sample, while its rate is unknown
+
+    def process(self, key, times, block):
+        block = np.asarray(block, dtype=np.float64)
+        if not self.enabled or len(block) == 0:
+            return block
+        entry = self.filters.get(key)
+        if entry is None:
+            times = np.asarray(times, dtype=np.float64)
+            first_time, first_row = self.first_samples.setdefault(key, (times[0], block[0]))
+            steps = np.diff(np.r_[first_time, times])
+            steps = steps[steps > 0]
+            fs = 1 / (np.median(steps) * self.time_scale) if len(steps) else 0
+            if fs <= 2 * self.cutoff:
+                # Rate not known yet; a high-pass settled on these samples outputs zero
+                return np.zeros_like(block)
+            sos = butter(self.order, self.cutoff, btype="highpass", fs=fs, output="sos")
+            entry = self.filters[key] = [sos, sosfilt_zi(sos)[:, :, np.newaxis] * first_row]
+            del self.first_samples[key]
+            if times[0] != first_time:
+                # The first sample came in an earlier block (and went out as zero); it still
+                # feeds the state so the filter continues from where it really started
+                _, entry[1] = sosfilt(sos, first_row[np.newaxis], axis=0, zi=entry[1])
+        filtered, entry[1] = sosfilt(entry[0], block, axis=0, zi=entry[1])
+        return filtered
+
+    def process_block(self, keys, times, block):
+        # Filters an interleaved block; rows of each key keep their order and their own state
+        keys = np.asarray(keys)
+        times = np.asarray(times, dtype=np.float64)
+        block = np.asarray(block, dtype=np.float64)
+        if not self.enabled:
+            return block
+        filtered = np.empty_like(block)
+        for key in np.unique(keys):
+            rows = keys == key
+            filtered[rows] = self.process(key.item(), times[rows], block[rows])
+        return filtered
+
+
+class RingBuffer:
+    # Fixed-capacity FIFO of rows; the newest `capacity` rows are kept in order
+    def __init__(self, capacity, channels):
+        self.capacity = int(capacity)
+        self.data = np.zeros((self.capacity, channels))
+        self.position = 0
+        self.count = 0
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)[-self.capacity:]
+        n = len(rows)
+        end = self.position + n
+        if end <= self.capacity:
+            self.data[self.position:end] = rows
+        else:
+            split = self.capacity - self.position
+            self.data[self.position:] = rows[:split]
+            self.data[:n - split] = rows[split:]
+        self.position = end % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def latest(self, n):
+        # The newest n rows, oldest first
+        n = min(n, self.count)
+        indices = (self.position - n + np.arange(n)) % self.capacity
+        return self.data[indices]
+
+    def oldest(self, n):
+        # The oldest n rows, oldest first; only those rows are gathered
+        n = min(n, self.count)
+        indices = (self.position - self.count + np.arange(n)) % self.capacity
+        return self.data[indices]
+
+
+class RollingSpectrum:
+    # Live magnitude spectrum of one sensor's axes over its most recent samples: the newest
+    # `averages` frames of `length` samples (with `overlap`) are windowed and transformed in
+    # one rfft, and their magnitudes averaged. The window is cached per length.
+    def __init__(self, length=1024, overlap=0.5, averages=4, channels=3):
+        self.channels = channels
+        self.configure(length, overlap, averages)
+
+    def configure(self, length, overlap=0.5, averages=4):
+        self.length = int(length)
+        self.hop = max(1, int(self.length * (1 - overlap)))
+        self.averages = max(1, int(averages))
+        span = self.length + (self.averages - 1) * self.hop
+        self.samples = RingBuffer(span, self.channels)
+        self.times = RingBuffer(span, 1)
+        self.window = np.hanning(self.length)
+        self.updated = False
+
+    def extend(self, times, block):
+        self.samples.extend(block)
+        self.times.extend(np.asarray(times, dtype=np.float64)[:, np.newaxis])
+        self.updated = True
+
+    def spectrum(self, time_scale=1e-6):
+        # (freqs, magnitudes (channels, bins)), or None until one full frame has arrived
+        self.updated = False
+        if self.samples.count < self.length:
+            return None
+        n_frames = min(self.averages, 1 + (self.samples.count - self.length) // self.hop)
+        span = self.length + (n_frames - 1) * self.hop
+        samples = self.samples.latest(span)
+        times = self.times.latest(span)[:, 0]
+        dt = np.median(np.diff(times)) * time_scale
+        if dt <= 0:
+            return None
+        starts = np.arange(n_frames) * self.hop
+        frames = samples[starts[:, np.newaxis] + np.arange(self.length)]  # (frames, length, channels)
+        frames = frames - frames.mean(axis=1, keepdims=True)
+        magnitudes = np.abs(sp_fft.rfft(frames * self.window[:, np.newaxis], axis=1)).mean(axis=0)
+        return sp_fft.rfftfreq(self.length, d=dt), magnitudes.T
+
+
+def load_reference_modes(file_path):
+    # Natural frequencies from a *_selected_natural_frequencies.csv or combined_values.csv
+    data = pd.read_csv(file_path)
+    column = "Natural Frequency (Hz)" if "Natural Frequency (Hz)" in data.columns else data.columns[0]
+    return np.unique(pd.to_numeric(data[column], errors="coerce").dropna().to_numpy(dtype=np.float64))
+
+
+class SlidingDFTBank:
+    # Sliding DFT over the last `length` samples at a handful of lines around each reference
+    # frequency. Each line keeps A = sum x[m] exp(-j w m) over the window; a new block adds
+    # its samples and subtracts the ones leaving the window, so the cost per sample is
+    # O(lines) whatever the window length. Lines are one bin (fs / length) apart, `span_bins`
+    # either side of each reference plus one more that only feeds the frequency-domain Hann
+    # window, and the peak is interpolated between them.
+    RESYNC_WINDOWS = 8  # Recompute the sums exactly every few windows to stop round-off drift
+
+    def __init__(self, reference_freqs, fs, length=2048, channels=3, span_bins=2):
+        self.reference_freqs = np.asarray(reference_freqs, dtype=np.float64)
+        self.fs = float(fs)
+        self.length = int(length)
+        self.bin_hz = self.fs / self.length
+        self.offsets = np.arange(-span_bins - 1, span_bins + 2)
+        self.line_freqs = self.reference_freqs[:, np.newaxis] + self.offsets * self.bin_hz  # (modes, lines)
+        self.omega = 2 * np.pi * self.line_freqs.ravel() / self.fs
+        self.history = RingBuffer(self.length, channels)
+        self.sums = np.zeros((channels, self.omega.size), dtype=np.complex128)
+        self.sample_index = 0
+        self.since_resync = 0
+
+    def phasors(self, start, n):
+        # exp(-j w m) for m = start .. start + n - 1, phase wrapped to keep precision: (n, lines)
+        m = start + np.arange(n)
+        return np.exp(-1j * np.mod(np.outer(m, self.omega), 2 * np.pi))
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        n = len(block)
+        if n == 0:
+            return
+        if n >= self.length:
+            self.history.extend(block)
+            self.sample_index += n
+            self.resync()
+            return
+        leaving = max(0, self.history.count + n - self.length)
+        if leaving:
+            old = self.history.oldest(leaving)
+            start = self.sample_index - self.history.count
+            self.sums -= old.T @ self.phasors(start, leaving)
+        self.sums += block.T @ self.phasors(self.sample_index, n)
+        self.history.extend(block)
+        self.sample_index += n
+        self.since_resync += n
+        if self.since_resync >= self.RESYNC_WINDOWS * self.length:
+            self.resync()
+
+    def resync(self):
+        samples = self.history.latest(self.history.count)
+        self.sums = samples.T @ self.phasors(self.sample_index - len(samples), len(samples))
+        self.since_resync = 0
+
+    def modes(self):
+        # Per channel and mode: amplitude and interpolated peak frequency. Returns two
+        # (channels, modes) arrays; NaN until the window has filled.
+        channels, modes = self.sums.shape[0], len(self.reference_freqs)
+        if self.history.count < self.length:
+            return np.full((channels, modes), np.nan), np.full((channels, modes), np.nan)
+        # Reference each line to the window start, then Hann = 0.5 X[k] - 0.25 (X[k-1] + X[k+1])
+        start = self.sample_index - self.length
+        spectra = (self.sums * np.exp(1j * np.mod(self.omega * start, 2 * np.pi))).reshape(channels, modes, -1)
+        hann = 0.5 * spectra[..., 1:-1] - 0.25 * (spectra[..., :-2] + spectra[..., 2:])
+        magnitudes = np.abs(hann)
+        peak = np.clip(np.argmax(magnitudes, axis=-1), 1, magnitudes.shape[-1] - 2)
+        left, centre, right = (np.take_along_axis(magnitudes, (peak + shift)[..., np.newaxis], -1)[..., 0]
+                               for shift in (-1, 0, 1))
+        denominator = left - 2 * centre + right
+        delta = np.where(denominator < 0, 0.5 * (left - right) / np.where(denominator < 0, denominator, -1), 0)
+        delta = np.clip(delta, -1, 1)
+        inner_offsets = self.offsets[1:-1]
+        peak_freqs = self.reference_freqs + (inner_offsets[peak] + delta) * self.bin_hz
+        # A sinusoid of amplitude a gives |X_hann| = a N / 4
+        amplitudes = 4 * np.maximum(centre, np.max(magnitudes, axis=-1)) / self.length
+        return amplitudes, peak_freqs
+
+
+class ModeTracker:
+    # Sliding-DFT banks for every sensor, created on the first block that reveals the sensor's
+    # sample rate. A mode counts as shifted when its strongest axis peaks more than
+    # `tolerance_hz` away from the reference; the banks search twice that far.
+    def __init__(self, reference_freqs, length=2048, tolerance_hz=1.0, time_scale=1e-6):
+        self.reference_freqs = np.asarray(reference_freqs, dtype=np.float64)
+        self.length = length
+        self.time_scale = time_scale
+        self.set_tolerance(tolerance_hz)
+
+    def set_tolerance(self, tolerance_hz):
+        self.tolerance_hz = tolerance_hz
+        self.banks = {}
+
+    def update(self, sensor_ids, times, accels):
+        sensor_ids = np.asarray(sensor_ids)
+        for sensor_id in np.unique(sensor_ids):
+            rows = sensor_ids == sensor_id
+            key = sensor_id.item()
+            if key not in self.banks:
+                if rows.sum() < 2:
+                    continue
+                dt = np.median(np.diff(times[rows])) * self.time_scale
+                if dt <= 0:
+                    continue
+                span_bins = max(2, int(np.ceil(2 * self.tolerance_hz * dt * self.length)))
+                self.banks[key] = SlidingDFTBank(self.reference_freqs, 1 / dt, self.length, span_bins=span_bins)
+            self.banks[key].update(accels[rows])
+
+    def status(self):
+        # {sensor: {'amplitude', 'frequency', 'shift', 'shifted'}} with one entry per mode
+        report = {}
+        for key, bank in self.banks.items():
+            amplitudes, peak_freqs = bank.modes()
+            if np.isnan(amplitudes).all():
+                continue
+            strongest = np.argmax(amplitudes, axis=0)
+            columns = np.arange(len(self.reference_freqs))
+            frequency = peak_freqs[strongest, columns]
+            shift = frequency - self.reference_freqs
+            report[key] = {
+                'amplitude': amplitudes[strongest, columns],
+                'frequency': frequency,
+                'shift': shift,
+                'shifted': np.abs(shift) > self.tolerance_hz,
+            }
+        return report
@@ -0,0 +1,244 @@
+import time
+
+import numpy as np
+from scipy import fft as sp_fft
+from scipy.ndimage import maximum_filter1d
+from scipy.signal import get_window
+
+from signal_processing import PRECISIONS, analysis_info, padded_length, segment_frames
+
+MAD_TO_SIGMA = 1.4826
+
+
+def find_hits(time_values, accel_values, threshold_factor=10.0, release_factor=3.0, envelope_s=0.005,
+              min_gap_s=0.05, min_duration_s=0.02, pre_trigger_s=0.002, time_scale=1e-6):
+    # Impact onsets and ring-down ends for one sensor. `accel_values` is (n, axes); the
+    # envelope is a running max of the deviation from the quiescent baseline. A hit starts
+    # where the envelope rises above the release level around a sample that exceeds the
+    # onset level, and ends when the envelope decays back below the release level.
+    # Returns an (n_hits, 2) array of [start, end] times in the units of `time_values`.
+    time_values = np.asarray(time_values, dtype=np.float64)
+    accel_values = np.asarray(accel_values, dtype=np.float64).reshape(len(time_values), -1)
+    if len(time_values) < 3:
+        return np.empty((0, 2))
+
+    dt = np.median(np.diff(time_values)) * time_scale
+    if dt <= 0:
+        return np.empty((0, 2))
+    deviation = np.linalg.norm(accel_values - np.median(accel_values, axis=0), axis=1)
+    envelope = maximum_filter1d(deviation, size=max(1, int(round(envelope_s / dt))))
+
+    baseline = np.median(envelope)
+    spread = MAD_TO_SIGMA * np.median(np.abs(envelope - baseline))
+    spread = max(spread, 1e-6 * max(np.max(envelope), 1e-12))
+    onset_level = baseline + threshold_factor * spread
+    release_level = baseline + release_factor * spread
+
+    active = np.concatenate(([False], envelope > release_level, [False]))
+    edges = np.diff(active.astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)  # Exclusive
+    if len(starts) == 0:
+        return np.empty((0, 2))
+
+    # Merge runs separated by short quiet gaps (ring-down dipping under the release level)
+    gap_samples = int(round(min_gap_s / dt))
+    new_run = np.concatenate(([True], starts[1:] - ends[:-1] > gap_samples))
+    starts = starts[new_run]
+    ends = ends[np.concatenate((new_run[1:], [True]))]
+
+    # Keep runs that contain an onset-level sample and last long enough
+    peaks = np.maximum.reduceat(envelope, starts)
+    keep = (peaks >= onset_level) & ((ends - starts) * dt >= min_duration_s)
+    starts, ends = starts[keep], ends[keep]
+
+    pre_trigger = int(round(pre_trigger_s / dt))
+    start_times = time_values[np.maximum(starts - pre_trigger, 0)]
+    end_times = time_values[ends - 1]
+    return np.column_stack((start_times, end_times))
+
+
+def merge_intervals(intervals):
+    # Union of [start, end] intervals, e.g. the same impact seen by several sensors
+    intervals = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+    if len(intervals) == 0:
+        return intervals
+    intervals = intervals[np.argsort(intervals[:, 0])]
+    running_end = np.maximum.accumulate(intervals[:, 1])
+    new_group = np.concatenate(([True], intervals[1:, 0] > running_end[:-1]))
+    group_ids = np.cumsum(new_group) - 1
+    starts = intervals[new_group, 0]
+    ends = np.zeros(len(starts))
+    np.maximum.at(ends, group_ids, intervals[:, 1])
+    return np.column_stack((starts, ends))
+
+
+def batch_spectra(segments, dt, padding_factor=1, precision="float64"):
+    # Magnitude spectra of many segments with a single rfft call. Each segment gets its own
+    # Hann window and all are zero-padded to a common fast length, so every row shares
+    # one frequency axis.
+    start = time.perf_counter()
+    dtype = PRECISIONS[precision][0]
+    lengths = np.array([len(segment) for segment in segments], dtype=int)
+    if len(lengths) == 0 or lengths.max() == 0:
+        return np.array([], dtype=dtype), np.empty((0, 0), dtype=dtype), None
+    fft_length = padded_length(lengths.max(), padding_factor)
+    frames = np.zeros((len(segments), lengths.max()), dtype=dtype)
+    for row, segment in enumerate(segments):
+        frames[row, :len(segment)] = (segment - np.mean(segment)) * np.hanning(len(segment))
+    magnitudes = np.abs(sp_fft.rfft(frames, n=fft_length, axis=-1))
+    freqs = sp_fft.rfftfreq(fft_length, d=dt).astype(dtype)
+    info = analysis_info("full", precision, int(lengths.max()), len(segments), lengths.max(), fft_length, dt, start)
+    return freqs, magnitudes, info
+
+
+def align_segments(segments, dts, onset_fraction=0.2, pre_trigger_s=0.002):
+    # Brings hits from one file or many onto a common time base, cut at the onset and
+    # truncated to the shortest ring-down. The onset is the first sample whose deviation
+    # reaches `onset_fraction` of that hit's maximum deviation.
+    dt = float(np.median(dts))
+    resampled = []
+    for segment, segment_dt in zip(segments, dts):
+        segment = np.asarray(segment, dtype=np.float64)
+        if abs(segment_dt / dt - 1) > 1e-6:
+            source_time = np.arange(len(segment)) * segment_dt
+            segment = np.interp(np.arange(0, source_time[-1], dt), source_time, segment)
+        resampled.append(segment)
+
+    lengths = np.array([len(segment) for segment in resampled])
+    stack = np.full((len(resampled), lengths.max()), np.nan)
+    for row, segment in enumerate(resampled):
+        stack[row, :len(segment)] = segment
+    deviation = np.abs(stack - np.nanmedian(stack, axis=1, keepdims=True))
+    deviation = np.nan_to_num(deviation)
+    onsets = np.argmax(deviation >= onset_fraction * deviation.max(axis=1, keepdims=True), axis=1)
+    starts = np.maximum(onsets - int(round(pre_trigger_s / dt)), 0)
+    length = int(np.min(lengths - starts))
+    aligned = stack[np.arange(len(stack))[:, np.newaxis], starts[:, np.newaxis] + np.arange(length)]
+    return aligned, dt
+
+
+def ensemble_spectra(segments, dts, padding_factor=1, precision="float64", mode="magnitude", reference=0):
+    # Averages the spectra of N aligned hits computed with one batched rfft.
+    # "magnitude" averages |X|; "cross" averages X * conj(X_ref) so only content that is
+    # phase-consistent with the reference hit survives. Per-bin variance is of |X|.
+    start = time.perf_counter()
+    dtype, complex_dtype = PRECISIONS[precision]
+    aligned, dt = align_segments(segments, dts)
+    n_hits, length = aligned.shape
+    fft_length = padded_length(length, padding_factor)
+    frames = (aligned - aligned.mean(axis=1, keepdims=True)) * np.hanning(length)
+    spectra = sp_fft.rfft(frames.astype(dtype), n=fft_length, axis=-1)
+    magnitudes = np.abs(spectra)
+
+    if mode == "magnitude":
+        mean_spectrum = magnitudes.mean(axis=0)
+        consistency = None
+    elif mode == "cross":
+        cross = spectra * np.conj(spectra[reference])
+        reference_magnitude = np.maximum(magnitudes[reference], np.finfo(dtype).tiny)
+        mean_spectrum = np.abs(cross.mean(axis=0)) / reference_magnitude
+        # 1 where every hit agrees in phase with the reference, towards 0 for random phase
+        consistency = np.abs(cross.mean(axis=0)) / np.maximum(np.abs(cross).mean(axis=0), np.finfo(dtype).tiny)
+    else:
+        raise ValueError(f"Unknown averaging mode: {mode}")
+
+    variance = magnitudes.var(axis=0, ddof=1) if n_hits > 1 else np.zeros_like(mean_spectrum)
+    info = analysis_info("averaged", precision, length, n_hits, length, fft_length, dt, start)
+    return {
+        'freqs': sp_fft.rfftfreq(fft_length, d=dt).astype(dtype),
+        'mean': mean_spectrum.astype(dtype),
+        'variance': variance.astype(dtype),
+        'consistency': consistency,
+        'hits': n_hits,
+        'dt': dt,
+        'info': info,
+    }
+
+
+def response_frames(responses, frame_length, overlap=0.5):
+    # Welch frames of every channel in `responses` (channels, n): (channels, segments, frame_length)
+    return np.stack([segment_frames(np.asarray(row), frame_length, overlap) for row in responses])
+
+
+def channel_frames(force, responses, frame_length, overlap=0.5):
+    # Splits a force signal (n,) and responses (channels, n) into matching Welch frames:
+    # force (segments, frame_length) and responses (channels, segments, frame_length)
+    force_frames = segment_frames(np.asarray(force), frame_length, overlap)
+    return force_frames, response_frames(responses, frame_length, overlap)
+
+
+def compute_frf(force_frames, response_frames, dt, padding_factor=1, precision="float64", window="hann"):
+    # H1/H2 frequency response functions and coherence for every response channel.
+    # Force and response frames (one frame per hit or Welch segment) are stacked and
+    # transformed in a single rfft; auto/cross spectra are averaged over the frames.
+    # Whole-hit frames should use window="boxcar" so the impulse at the frame start survives.
+    #   H1 = Gfx / Gff          (noise on the response)
+    #   H2 = Gxx / conj(Gfx)    (noise on the force)
+    #   coherence = |Gfx|^2 / (Gff * Gxx)
+    start = time.perf_counter()
+    dtype, complex_dtype = PRECISIONS[precision]
+    force_frames = np.asarray(force_frames, dtype=dtype)
+    response_frames = np.asarray(response_frames, dtype=dtype)
+    n_channels, n_frames, frame_length = response_frames.shape
+    fft_length = padded_length(frame_length, padding_factor)
+
+    stack = np.concatenate((force_frames[np.newaxis], response_frames))
+    stack = (stack - stack.mean(axis=-1, keepdims=True)) * get_window(window, frame_length).astype(dtype)
+    spectra = sp_fft.rfft(stack, n=fft_length, axis=-1)
+    force_spectra, response_spectra = spectra[0], spectra[1:]
+
+    tiny = np.finfo(dtype).tiny
+    g_ff = np.mean(np.abs(force_spectra) ** 2, axis=0)
+    g_xx = np.mean(np.abs(response_spectra) ** 2, axis=1)
+    g_fx = np.mean(np.conj(force_spectra) * response_spectra, axis=1)
+    h1 = g_fx / np.maximum(g_ff, tiny)
+    h2 = g_xx / np.where(np.abs(g_fx) > tiny, np.conj(g_fx), tiny)
+    coherence = np.abs(g_fx) ** 2 / np.maximum(g_ff * g_xx, tiny)
+
+    info = analysis_info("averaged", precision, frame_length, n_frames, frame_length, fft_length, dt, start,
+                         transforms=(n_channels + 1) * n_frames)
+    return {
+        'freqs': sp_fft.rfftfreq(fft_length, d=dt).astype(dtype),
+        'h1': h1.astype(complex_dtype),
+        'h2': h2.astype(complex_dtype),
+        'coherence': np.clip(coherence, 0, 1).astype(dtype),
+        'frames': n_frames,
+        'dt': dt,
+        'info': info,
+    }
+
+
+def frequency_domain_decomposition(frames, dt, padding_factor=1, precision="float64", window="hann"):
+    # Operational modal analysis over every channel at once. The cross-spectral density
+    # matrix G(f) = mean over frames of X(f) X(f)^H is built for all frequency lines and
+    # decomposed with one batched SVD; peaks of the first singular value are modes and the
+    # matching first singular vector is the mode shape. `frames` is (channels, segments, n).
+    start = time.perf_counter()
+    dtype, complex_dtype = PRECISIONS[precision]
+    frames = np.asarray(frames, dtype=dtype)
+    n_channels, n_frames, frame_length = frames.shape
+    fft_length = padded_length(frame_length, padding_factor)
+
+    frames = (frames - frames.mean(axis=-1, keepdims=True)) * get_window(window, frame_length).astype(dtype)
+    spectra = sp_fft.rfft(frames, n=fft_length, axis=-1)
+    # (freqs, channels, channels), Hermitian at every line
+    csd = np.einsum('isf,jsf->fij', spectra, np.conj(spectra)) / n_frames
+    u, singular_values, _ = np.linalg.svd(csd, hermitian=True)
+
+    # Phase-align each shape so its largest component is real and positive, then scale to 1
+    shapes = u[:, :, 0]
+    largest = shapes[np.arange(len(shapes)), np.argmax(np.abs(shapes), axis=1)]
+    shapes = shapes * (np.conj(largest) / np.maximum(np.abs(largest), np.finfo(dtype).tiny) ** 2)[:, np.newaxis]
+
+    # Plus one n_channels x n_channels SVD per bin
+    info = analysis_info("averaged", precision, frame_length, n_frames, frame_length, fft_length, dt, start,
+                         transforms=n_channels * n_frames, extra_flops=(fft_length // 2 + 1) * n_channels ** 3)
+    return {
+        'freqs': sp_fft.rfftfreq(fft_length, d=dt).astype(dtype),
+        'singular_values': singular_values.astype(dtype),
+        'shapes': shapes.astype(complex_dtype),
+        'frames': n_frames,
+        'dt': dt,
+        'info': info,
+    }
@@ -0,0 +1,101 @@
+import numpy as np
+import pyqtgraph as pg
+
+
+class MinMaxPyramid:
+    # Min/max envelope of one channel at block sizes 2, 4, 8, ... samples. Each level is built
+    # from the one below the first time a view needs it, so the whole pyramid costs O(n) once;
+    # after that any view only touches the level whose blocks are about one pixel wide.
+    def __init__(self, x, y):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y)
+        self.levels = []  # (block size, x of each block start, block minima, block maxima)
+
+    def level(self, block):
+        # The finest level whose blocks hold at least `block` samples (or the coarsest one)
+        while (not self.levels or self.levels[-1][0] < block) and self._build_next():
+            pass
+        for level in self.levels:
+            if level[0] >= block:
+                return level
+        return self.levels[-1]
+
+    def _build_next(self):
+        if self.levels:
+            size, x, mins, maxs = self.levels[-1]
+        else:
+            size, x, mins, maxs = 1, self.x, self.y, self.y
+        if len(x) < 2:
+            return False
+        if len(x) % 2:
+            # Odd length: the last block only holds the final sample
+            mins, maxs = np.append(mins, mins[-1]), np.append(maxs, maxs[-1])
+        self.levels.append((2 * size, x[::2], np.minimum(mins[0::2], mins[1::2]),
+                            np.maximum(maxs[0::2], maxs[1::2])))
+        return True
+
+    def view(self, x_min, x_max, pixels):
+        # Points to draw for the range: raw samples when they fit, otherwise one min and one
+        # max per block of the matching level, i.e. about 2 * pixels points
+        n = len(self.x)
+        start = max(int(np.searchsorted(self.x, x_min, side="left")) - 1, 0)
+        stop = min(int(np.searchsorted(self.x, x_max, side="right")) + 1, n)
+        count = stop - start
+        pixels = max(int(pixels), 1)
+        if count <= 2 * pixels:
+            return self.x[start:stop], self.y[start:stop]
+        size, x, mins, maxs = self.level(count / pixels)
+        first, last = start // size, -(-stop // size)
+        xs = np.repeat(x[first:last], 2)
+        ys = np.empty(len(xs), dtype=mins.dtype)
+        ys[0::2] = mins[first:last]
+        ys[1::2] = maxs[first:last]
+        return xs, ys
+
+
+class DecimatedCurve(pg.PlotDataItem):
+    # Curve drawn from a MinMaxPyramid: whenever the x range of its view changes it fetches
+    # only the samples (or min/max blocks) that fall on screen, limited to `x_limits`
+    DEFAULT_PIXELS = 2000  # Used until the curve is in a view with a known width
+
+    def __init__(self, pyramid, x_limits=None, **kwargs):
+        super().__init__(**kwargs)
+        self.set_source(pyramid, x_limits)
+
+    def set_source(self, pyramid, x_limits=None):
+        # Points the curve at new data (or a new window) without recreating it
+        self.pyramid = pyramid
+        if x_limits is None and len(pyramid.x):
+            x_limits = (pyramid.x[0], pyramid.x[-1])
+        self.x_limits = x_limits or (0, 0)
+        # Bounds for auto-ranging come from the whole envelope, not from what is on screen
+        _, y = pyramid.view(self.x_limits[0], self.x_limits[1], self.DEFAULT_PIXELS)
+        self.y_bounds = [np.nanmin(y), np.nanmax(y)] if len(y) else [None, None]
+        self.shown = None
+        self.refresh()
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        return list(self.x_limits) if ax == 0 else list(self.y_bounds)
+
+    def viewRangeChanged(self, vb=None, ranges=None, changed=None):
+        super().viewRangeChanged(vb, ranges, changed)
+        if changed is None or changed[0]:
+            self.refresh()
+
+    def refresh(self):
+        x_min, x_max = self.x_limits
+        pixels = self.DEFAULT_PIXELS
+        view = self.getViewBox()
+        if view is not None and view.width() > 0:
+            (view_min, view_max), _ = view.viewRange()
+            x_min, x_max = max(x_min, view_min), min(x_max, view_max)
+            pixels = view.width()
+        key = (x_min, x_max, int(pixels))
+        if key == self.shown:
+            return
+        self.shown = key
+        if x_max < x_min:
+            self.setData([], [])
+            return
+        x, y = self.pyramid.view(x_min, x_max, pixels)
+        self.setData(x, y)
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from signal_processing import to_physical_units
+
+TIME_COLUMN = 'Time [microseconds]'
+ID_COLUMN = 'Accelerometer ID'
+CACHE_VERSION = 1  # Bump whenever the normalization in parse_samples changes
+CACHE_SUFFIX = ".cache.npy"  # Column data, one structured record per row
+CACHE_META_SUFFIX = ".cache.json"  # Version and source-file signature the data was built from
+
+
+def read_samples(file_path):
+    # Recording sorted by sensor and time, starting at t = 0, in recorded units. Comes from
+    # the binary sidecar when it matches the CSV, otherwise the CSV is parsed and the
+    # sidecar (re)written for next time.
+    data = read_cache(file_path)
+    if data is None:
+        data = parse_samples(file_path)
+        write_cache(file_path, data)
+    return data
+
+
+def load_sample(file_path, dataset_index, dtype=np.float64):
+    # Everything needed to analyse one file, in physical units and indexed by sensor. Runs in
+    # a worker process when several files are opened at once, so it must stay picklable.
+    # Only the converted acceleration columns are new arrays; from the sidecar, time and
+    # sensor id columns stay memory-mapped views
+    data = read_samples(file_path)
+    data['Dataset Index'] = dataset_index
+    data = to_physical_units(data, dtype)
+    return data, SensorIndex(data)
+
+
+def parse_samples(file_path):
+    data = pd.read_csv(file_path)
+    if not data[TIME_COLUMN].is_monotonic_increasing:
+        print("Warning: Time data is not monotonic. Sorting may affect interpretation.")
+    data = sensor_major(data)
+    data[TIME_COLUMN] -= data[TIME_COLUMN].min()
+    return data
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_cache(file_path):
+    # None when there is no sidecar or it was built from another version of the file. Size
+    # and mtime are checked first; a changed mtime alone (copy, touch) falls back to the hash.
+    meta_path = file_path + CACHE_META_SUFFIX
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        stat = os.stat(file_path)
+        if meta.get('version') != CACHE_VERSION or meta.get('size') != stat.st_size:
+            return None
+        if meta.get('mtime_ns') != stat.st_mtime_ns:
+            if meta.get('hash') != file_hash(file_path):
+                return None
+            meta['mtime_ns'] = stat.st_mtime_ns
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        records = np.load(file_path + CACHE_SUFFIX, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring sample cache for {file_path}: {e}")
+        return None
+    # copy=False keeps every column a view into the mapping instead of reading it all in
+    return pd.DataFrame({name: records[name] for name in records.dtype.names}, copy=False)
+
+
+def has_fresh_cache(file_path):
+    # Cheap guess that read_cache will use the sidecar: version, size and mtime all match.
+    # A changed mtime means hashing the CSV, which is no longer the cheap case.
+    try:
+        with open(file_path + CACHE_META_SUFFIX, "r") as f:
+            meta = json.load(f)
+        stat = os.stat(file_path)
+        return (meta.get('version') == CACHE_VERSION and meta.get('size') == stat.st_size
+                and meta.get('mtime_ns') == stat.st_mtime_ns and os.path.exists(file_path + CACHE_SUFFIX))
+    except (OSError, ValueError):
+        return False
+
+
+def write_cache(file_path, data):
+    if not all(np.issubdtype(dtype, np.number) for dtype in data.dtypes):
+        return  # Only plain numeric columns can be memory-mapped
+    records = np.empty(len(data), dtype=[(column, data[column].dtype) for column in data.columns])
+    for column in data.columns:
+        records[column] = data[column].to_numpy()
+    try:
+        stat = os.stat(file_path)
+        meta = {'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'hash': file_hash(file_path), 'rows': len(data)}
+        # Data first, then the metadata that validates it, each replaced atomically
+        with open(file_path + CACHE_SUFFIX + ".tmp", "wb") as f:
+            np.save(f, records)
+        os.replace(file_path + CACHE_SUFFIX + ".tmp", file_path + CACHE_SUFFIX)
+        with open(file_path + CACHE_META_SUFFIX + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(file_path + CACHE_META_SUFFIX + ".tmp", file_path + CACHE_META_SUFFIX)
+    except OSError as e:
+        print(f"Could not write sample cache for {file_path}: {e}")
+
+
+def sensor_major(data):
+    # Rows stable-sorted by sensor, then time, so every sensor is one contiguous and
+    # time-sorted block. Files without sensor ids are just sorted by time.
+    if ID_COLUMN not in data.columns:
+        return data.sort_values(by=TIME_COLUMN, kind="stable").reset_index(drop=True)
+    order = np.lexsort((data[TIME_COLUMN].to_numpy(), data[ID_COLUMN].astype(str).to_numpy()))
+    return data.iloc[order].reset_index(drop=True)
+
+
+class SensorIndex:
+    # Row bounds of each sensor in a sensor_major frame. Selecting a sensor is a slice, and a
+    # time window inside it is two searchsorted calls, so nothing is masked or copied.
+    def __init__(self, data):
+        self.data = data
+        self.times = data[TIME_COLUMN].to_numpy()
+        self.bounds = {}
+        if ID_COLUMN in data.columns and len(data):
+            ids = data[ID_COLUMN].astype(str).to_numpy()
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+            stops = np.r_[starts[1:], len(ids)]
+            self.bounds = {ids[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+            if len(self.bounds) != len(starts):
+                raise ValueError("Samples are not grouped by sensor; load them through sensor_major first.")
+
+    def sensor_ids(self):
+        return sorted(self.bounds)
+
+    def rows(self, sensor_id, start_time=None, end_time=None):
+        lo, hi = self.bounds.get(str(sensor_id), (0, 0))
+        if start_time is not None:
+            times = self.times[lo:hi]
+            lo, hi = (lo + int(np.searchsorted(times, start_time, side="left")),
+                      lo + int(np.searchsorted(times, end_time, side="right")))
+        return lo, hi
+
+    def sensor(self, sensor_id, start_time=None, end_time=None):
+        lo, hi = self.rows(sensor_id, start_time, end_time)
+        return self.data.iloc[lo:hi]
+
+
+def time_window(data, start_time, end_time):
+    # Rows of a time-sorted frame with start_time <= time <= end_time, as a slice
+    times = data[TIME_COLUMN].to_numpy()
+    lo = np.searchsorted(times, start_time, side="left")
+    hi = np.searchsorted(times, end_time, side="right")
+    return data.iloc[lo:hi]
@@ -1,13 +1,24 @@
-from PySide6.QtCore import Qt
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QLabel, QCheckBox, QComboBox, QPushButton, QScrollArea
+import numpy as np
+import pyqtgraph as pg
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QLabel, QCheckBox, QComboBox, QPushButton, QScrollArea, \
+    QFileDialog, QListWidget
 from pglive.sources.data_connector import DataConnector
 from pglive.sources.live_axis_range import LiveAxisRange
 from pglive.sources.live_plot import LiveLinePlot
 from pglive.sources.live_plot_widget import LivePlotWidget
 
 from data_recorder import DataRecorder
+from live_processing import ModeTracker, RollingSpectrum, load_reference_modes
 from serial_reader import SerialReader
 
+LIVE_SPECTRUM_SIZES = [256, 512, 1024, 2048, 4096]
+LIVE_SPECTRUM_RATES = [2, 5, 10, 20]  # Hz
+LIVE_SPECTRUM_AVERAGES = 4  # Frames averaged per refresh, 50% overlap
+MODE_TOLERANCES = [0.25, 0.5, 1.0, 2.0]  # Hz
+MODE_REFRESH_MS = 200
+
 class SerialPlotterTab(QWidget):
     def __init__(self):
         super().__init__()
@@ -33,6 +44,9 @@ class SerialPlotterTab(QWidget):
 
         # Initialize sensor data storage
         self.init_sensor_data()
+        self.init_live_spectra()
+        self.serial_reader.block_received.connect(self.update_live_spectra)
+        self.serial_reader.block_received.connect(self.track_modes)
 
     def setup_options_menu(self):
         self.serial_ports = ["/dev/ttyACM0", "/dev/ttyACM1", "/dev/ttyUSB0", "/dev/ttyUSB1", "COM0", "COM1", "COM2", "COM3", "COM4", "COM5", "COM6", "COM7", "COM8", "COM9"]
@@ -43,6 +57,7 @@ class SerialPlotterTab(QWidget):
 
         self.data_recorder = DataRecorder()  # Create an instance of DataRecorder
         self.data_recorder.start()
+        self.serial_reader.raw_block_received.connect(self.data_recorder.auto_record_block)
 
         scroll_area = QScrollArea()
         scroll_area.setWidgetResizable(True)
@@ -85,6 +100,13 @@ class SerialPlotterTab(QWidget):
         self.communication_speed_combo.currentIndexChanged.connect(self.speed_button)
         content_layout.addWidget(self.communication_speed_combo, 2, 1)
 
+        # Checkbox for the ingest high-pass (gravity and drift removal)
+        self.high_pass_checkbox = QCheckBox("Remove Gravity")
+        self.high_pass_checkbox.setChecked(self.serial_reader.high_pass.enabled)
+        self.high_pass_checkbox.stateChanged.connect(self.toggle_high_pass)
+        self.high_pass_checkbox.setLayoutDirection(Qt.LayoutDirection.RightToLeft)
+        content_layout.addWidget(self.high_pass_checkbox, 3, 0, 1, 2)
+
         # Serial port combo
         serial_port_label = QLabel("COM Port:")
         serial_port_label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
@@ -134,6 +156,57 @@ class SerialPlotterTab(QWidget):
         self.export_button.clicked.connect(self.export_data)
         content_layout.addWidget(self.export_button, 9, 0, 1, 2)
 
+        # Calibrate button (sensors must be at rest)
+        self.calibrate_button = QPushButton("Calibrate")
+        self.calibrate_button.clicked.connect(self.start_calibration)
+        content_layout.addWidget(self.calibrate_button, 10, 0, 1, 2)
+        self.serial_reader.calibration_finished.connect(self.on_calibration_finished)
+
+        # Live spectrum pane
+        self.live_spectrum_checkbox = QCheckBox("Live Spectrum")
+        self.live_spectrum_checkbox.stateChanged.connect(self.toggle_live_spectrum)
+        self.live_spectrum_checkbox.setLayoutDirection(Qt.LayoutDirection.RightToLeft)
+        content_layout.addWidget(self.live_spectrum_checkbox, 11, 0, 1, 2)
+
+        spectrum_size_label = QLabel("FFT Size:")
+        spectrum_size_label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        content_layout.addWidget(spectrum_size_label, 12, 0)
+        self.spectrum_size_combo = QComboBox()
+        self.spectrum_size_combo.addItems([str(size) for size in LIVE_SPECTRUM_SIZES])
+        self.spectrum_size_combo.setCurrentIndex(2)  # Default to 1024
+        self.spectrum_size_combo.currentIndexChanged.connect(self.update_live_spectrum_settings)
+        content_layout.addWidget(self.spectrum_size_combo, 12, 1)
+
+        spectrum_rate_label = QLabel("Spectrum Rate:")
+        spectrum_rate_label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        content_layout.addWidget(spectrum_rate_label, 13, 0)
+        self.spectrum_rate_combo = QComboBox()
+        self.spectrum_rate_combo.addItems([f"{rate} Hz" for rate in LIVE_SPECTRUM_RATES])
+        self.spectrum_rate_combo.setCurrentIndex(1)  # Default to 5 Hz
+        self.spectrum_rate_combo.currentIndexChanged.connect(self.update_live_spectrum_settings)
+        content_layout.addWidget(self.spectrum_rate_combo, 13, 1)
+
+        # Reference mode tracking
+        self.load_modes_button = QPushButton("Load Reference Modes")
+        self.load_modes_button.clicked.connect(self.load_reference_modes)
+        content_layout.addWidget(self.load_modes_button, 14, 0, 1, 2)
+
+        mode_tolerance_label = QLabel("Shift Tolerance:")
+        mode_tolerance_label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        content_layout.addWidget(mode_tolerance_label, 15, 0)
+        self.mode_tolerance_combo = QComboBox()
+        self.mode_tolerance_combo.addItems([f"{tolerance} Hz" for tolerance in MODE_TOLERANCES])
+        self.mode_tolerance_combo.setCurrentIndex(2)  # Default to 1 Hz
+        self.mode_tolerance_combo.currentIndexChanged.connect(self.update_mode_tolerance)
+        content_layout.addWidget(self.mode_tolerance_combo, 15, 1)
+
+        self.mode_list_widget = QListWidget()
+        self.mode_list_widget.setMinimumHeight(150)
+        content_layout.addWidget(self.mode_list_widget, 16, 0, 1, 2)
+        self.mode_tracker = None
+        self.mode_timer = QTimer(self)
+        self.mode_timer.timeout.connect(self.refresh_mode_tracker)
+
         # Finalize the scroll area
         scroll_area.setWidget(content_widget)
         self.plot_layout.addWidget(scroll_area, 0, 3, 4, 1)
@@ -144,6 +217,103 @@ class SerialPlotterTab(QWidget):
         for sensor_id in range(1, self.sensor_count + 1):
             self.add_sensor_plot(sensor_id-1, sensor_id-1)
 
+    def init_live_spectra(self):
+        # One spectrum plot per sensor next to its time trace; curves are updated in place
+        self.live_spectra = {}
+        self.spectrum_curves = {}
+        self.spectrum_widgets = []
+        for sensor_id in range(self.sensor_count):
+            spectrum_widget = pg.PlotWidget(title=f'Sensor ID: {sensor_id} Spectrum')
+            spectrum_widget.setLabel('bottom', 'Frequency (Hz)')
+            colors = self.get_axis_colors(sensor_id)
+            self.spectrum_curves[sensor_id] = [spectrum_widget.plot(pen=colors[i]) for i in range(3)]
+            self.live_spectra[sensor_id] = RollingSpectrum(LIVE_SPECTRUM_SIZES[2], averages=LIVE_SPECTRUM_AVERAGES)
+            spectrum_widget.setVisible(False)
+            self.plot_layout.addWidget(spectrum_widget, sensor_id, 1)
+            self.spectrum_widgets.append(spectrum_widget)
+        self.spectrum_timer = QTimer(self)
+        self.spectrum_timer.timeout.connect(self.refresh_live_spectra)
+
+    def toggle_live_spectrum(self):
+        enabled = self.live_spectrum_checkbox.isChecked()
+        for spectrum_widget in self.spectrum_widgets:
+            spectrum_widget.setVisible(enabled)
+        if enabled:
+            self.update_live_spectrum_settings()
+        else:
+            self.spectrum_timer.stop()
+
+    def update_live_spectrum_settings(self):
+        length = LIVE_SPECTRUM_SIZES[self.spectrum_size_combo.currentIndex()]
+        for spectrum in self.live_spectra.values():
+            if spectrum.length != length:
+                spectrum.configure(length, averages=LIVE_SPECTRUM_AVERAGES)
+        if self.live_spectrum_checkbox.isChecked():
+            self.spectrum_timer.start(1000 // LIVE_SPECTRUM_RATES[self.spectrum_rate_combo.currentIndex()])
+
+    def update_live_spectra(self, sensor_ids, times, accels):
+        if not self.spectrum_timer.isActive():
+            return
+        sensor_ids = np.asarray(sensor_ids).astype(int)
+        for sensor_id in np.unique(sensor_ids):
+            spectrum = self.live_spectra.get(sensor_id.item())
+            if spectrum is not None:
+                rows = sensor_ids == sensor_id
+                spectrum.extend(times[rows], accels[rows])
+
+    def load_reference_modes(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Reference Modes", "", "CSV Files (*.csv)")
+        if not file_path:
+            return
+        try:
+            reference_freqs = load_reference_modes(file_path)
+        except Exception as e:
+            print(f"Error loading reference modes: {e}")
+            return
+        tolerance = MODE_TOLERANCES[self.mode_tolerance_combo.currentIndex()]
+        self.mode_tracker = ModeTracker(reference_freqs, tolerance_hz=tolerance)
+        self.mode_list_widget.clear()
+        self.mode_list_widget.addItems([f"{freq:.2f} Hz: waiting" for freq in reference_freqs])
+        self.mode_timer.start(MODE_REFRESH_MS)
+        print(f"Tracking {len(reference_freqs)} reference modes from {file_path}")
+
+    def update_mode_tolerance(self):
+        if self.mode_tracker is not None:
+            self.mode_tracker.set_tolerance(MODE_TOLERANCES[self.mode_tolerance_combo.currentIndex()])
+
+    def track_modes(self, sensor_ids, times, accels):
+        if self.mode_tracker is not None:
+            self.mode_tracker.update(sensor_ids, times, accels)
+
+    def refresh_mode_tracker(self):
+        # One row per reference mode, showing the sensor where it is strongest; red when
+        # any sensor sees it shifted beyond tolerance
+        report = self.mode_tracker.status()
+        if not report:
+            return
+        amplitudes = np.array([entry['amplitude'] for entry in report.values()])
+        frequencies = np.array([entry['frequency'] for entry in report.values()])
+        shifted = np.array([entry['shifted'] for entry in report.values()]).any(axis=0)
+        strongest = np.argmax(amplitudes, axis=0)
+        for row, reference in enumerate(self.mode_tracker.reference_freqs):
+            frequency = frequencies[strongest[row], row]
+            item = self.mode_list_widget.item(row)
+            item.setText(f"{reference:.2f} Hz: {frequency:.2f} ({frequency - reference:+.2f}) "
+                         f"A={amplitudes[strongest[row], row]:.3g}")
+            item.setBackground(QColor("#A4243B") if shifted[row] else QColor(0, 0, 0, 0))
+
+    def refresh_live_spectra(self):
+        # Only sensors that received samples since the last refresh are recomputed
+        for sensor_id, spectrum in self.live_spectra.items():
+            if not spectrum.updated:
+                continue
+            result = spectrum.spectrum()
+            if result is None:
+                continue
+            freqs, magnitudes = result
+            for curve, axis_magnitudes in zip(self.spectrum_curves[sensor_id], magnitudes):
+                curve.setData(freqs, axis_magnitudes)
+
     def get_axis_colors(self,sensor_id):
         if sensor_id == 0:
             # Sensor ID 0 - Variations of yellow
@@ -247,21 +417,24 @@ class SerialPlotterTab(QWidget):
         print(f"Attempting to change port to {selected_port}...")
         self.serial_reader.set_port(selected_port)
 
-    def update_data_buffers(self, sensor_id, timeus, accel_x, accel_y, accel_z):
+    def update_data_buffers(self, sensor_id, timeus, accel_x, accel_y, accel_z, force=float('nan')):
         sensor_id = int(sensor_id)  # Convert sensor_id to int
 
-        # Always handle auto recording logic
-        self.data_recorder.auto_record_data(timeus, sensor_id, accel_x, accel_y, accel_z)
-
+        # Auto recording is triggered from the unfiltered blocks (see auto_record_block).
         # If recording is active (either manual or auto), record data
         if self.data_recorder.recording:
-            self.data_recorder.record_data(timeus, sensor_id, accel_x, accel_y, accel_z)
+            self.data_recorder.record_data(timeus, sensor_id, accel_x, accel_y, accel_z, force)
 
         # Append data to the corresponding live plot connectors
         self.data_connectors[(sensor_id, 'X')].cb_append_data_point(accel_x, x=timeus)
         self.data_connectors[(sensor_id, 'Y')].cb_append_data_point(accel_y, x=timeus)
         self.data_connectors[(sensor_id, 'Z')].cb_append_data_point(accel_z, x=timeus)
 
+    def toggle_high_pass(self):
+        self.serial_reader.high_pass.enabled = self.high_pass_checkbox.isChecked()
+        self.serial_reader.high_pass.reset()
+        print(f"Ingest high-pass {'enabled' if self.serial_reader.high_pass.enabled else 'disabled'}")
+
     def toggle_plotting(self, state):
         if state == 0:  # 0 means unchecked
             print("Stopping plot updates...")
@@ -335,5 +508,18 @@ class SerialPlotterTab(QWidget):
     def on_auto_recording_stopped(self):
         self.auto_record_button.setStyleSheet("background-color: #650D1B; color: white;")
 
+    def start_calibration(self):
+        self.calibrate_button.setEnabled(False)
+        self.calibrate_button.setText("Calibrating...")
+        self.serial_reader.start_calibration()
+
+    def on_calibration_finished(self, calibration):
+        self.calibrate_button.setEnabled(True)
+        self.calibrate_button.setText("Calibrate")
+        if calibration:
+            print(f"Calibrated sensors: {', '.join(calibration)}")
+        else:
+            print("Calibration failed: no quiescent data received.")
+
     def export_data(self):
         self.data_recorder.export_data()
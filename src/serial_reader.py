@@ -1,8 +1,19 @@
+import numpy as np
 from PySide6.QtCore import QIODevice, QThread, Signal
 from PySide6.QtSerialPort import QSerialPort
 
+from calibration import CALIBRATION_SECONDS, Calibration, estimate_calibration, load_calibration, save_calibration
+from live_processing import StreamingHighPass
+
 class SerialReader(QThread):
-    data_received = Signal(str, float, float, float, float)
+    # sensor_id, time (µs), accel x/y/z, hammer force (NaN when no force channel is wired)
+    data_received = Signal(str, float, float, float, float, float)
+    # Whole parsed block after calibration/filtering: sensor ids, times (µs), accel (n, 3)
+    block_received = Signal(object, object, object)
+    # Same block after calibration only, gravity included: the impact trigger's hit_threshold
+    # was tuned on these values
+    raw_block_received = Signal(object, object, object)
+    calibration_finished = Signal(object)  # Per-sensor calibration dict (empty on failure)
 
     def __init__(self, port_name="/dev/ttyACM0", baud_rate=1000000):
         super().__init__()
@@ -12,6 +23,12 @@ class SerialReader(QThread):
         self.serial.setPortName(self.port_name)
         self.serial.setBaudRate(self.baud_rate)
         self.serial.readyRead.connect(self.read_data)
+        # Per-sensor bias/alignment correction, then gravity/drift removal, for every
+        # consumer (live plots, trigger, recordings)
+        self.calibration = Calibration(load_calibration())
+        self.high_pass = StreamingHighPass()
+        self.calibration_capture = None  # Raw blocks collected while calibrating
+        self.calibration_misalignment = False
 
     def run(self):
         if not self.serial.open(QIODevice.OpenModeFlag.ReadWrite):
@@ -31,6 +48,7 @@ class SerialReader(QThread):
     def set_speed(self, speed="1000"):
         if self.serial.write((str(speed) + '\n').encode()) and self.serial.isOpen():
             print(f"Successfully changed speed to {speed}.")
+            self.high_pass.reset()  # Each sensor's rate is measured again from its timestamps
         else:
             print(f"Failed to set speed to {speed}.")
 
@@ -41,19 +59,54 @@ class SerialReader(QThread):
             print(f"Connected to {self.serial.portName()}!")
 
     def read_data(self):
+        # Parse everything that is available, filter it as one block, then hand out samples
+        sensor_ids, times, accels, forces = [], [], [], []
         while self.serial.canReadLine():
             line = self.serial.readLine().data().decode().strip()
             parts = line.split()
-            if len(parts) == 5:
-                sensor_id, timeus, accel_x, accel_y, accel_z = parts
+            if len(parts) in (5, 6):
+                sensor_id, timeus, accel_x, accel_y, accel_z = parts[:5]
                 try:
                     timeus = float(timeus)
-                    accel_x = float(accel_x)
-                    accel_y = float(accel_y)
-                    accel_z = float(accel_z)
-                    self.data_received.emit(sensor_id, timeus, accel_x, accel_y, accel_z)
+                    accel = (float(accel_x), float(accel_y), float(accel_z))
+                    force = float(parts[5]) if len(parts) == 6 else float('nan')
                 except ValueError:
                     print("Error parsing data.")
+                    continue
+                sensor_ids.append(sensor_id)
+                times.append(timeus)
+                accels.append(accel)
+                forces.append(force)
+        if not sensor_ids:
+            return
+        if self.calibration_capture is not None:
+            self.capture_calibration(sensor_ids, times, accels)
+        accels = self.calibration.apply(sensor_ids, accels)
+        self.raw_block_received.emit(sensor_ids, np.asarray(times), accels)
+        accels = self.high_pass.process_block(sensor_ids, times, accels)
+        self.block_received.emit(sensor_ids, np.asarray(times), accels)
+        for sensor_id, timeus, (accel_x, accel_y, accel_z), force in zip(sensor_ids, times, accels.tolist(), forces):
+            self.data_received.emit(sensor_id, timeus, accel_x, accel_y, accel_z, force)
+
+    def start_calibration(self, misalignment=False):
+        # The sensors must be at rest; the stillest part of the capture is used
+        self.calibration_capture = []
+        self.calibration_misalignment = misalignment
+        print(f"Calibrating: keep the sensors still for {CALIBRATION_SECONDS:.0f} s...")
+
+    def capture_calibration(self, sensor_ids, times, accels):
+        self.calibration_capture.append((sensor_ids, times, accels))
+        first_time = self.calibration_capture[0][1][0]
+        if (times[-1] - first_time) * 1e-6 < CALIBRATION_SECONDS:
+            return
+        sensor_ids, times, accels = (np.concatenate(part) for part in zip(*self.calibration_capture))
+        self.calibration_capture = None
+        calibration = estimate_calibration(sensor_ids, times, accels, self.calibration_misalignment)
+        if calibration:
+            save_calibration(calibration)
+            self.calibration.set(calibration)
+            self.high_pass.reset()
+        self.calibration_finished.emit(calibration)
 
     def stop_serial(self):
         if self.serial.isOpen():
@@ -9,11 +9,13 @@ from PySide6.QtWidgets import (
     QSizePolicy,
     QComboBox,
     QSlider,
-    QLineEdit, QFormLayout, QFrame, QScrollArea, QGridLayout
+    QLineEdit, QFormLayout, QFrame, QScrollArea, QGridLayout, QFileDialog, QCheckBox
 )
 from PySide6.QtGui import QPixmap, QPainter
 from PySide6.QtCore import Qt, QPoint, QRect, QSize
 
+from calibration import calibrate_from_file, save_calibration
+
 CONFIG_FILE_PATH = "../Preferences/config.json"
 
 def load_stylesheet(app, style_name):
@@ -44,6 +46,10 @@ def update_config_file(
         "recording_delay": recording_delay,
         "recording_duration": recording_duration,
     }
+    # Keep entries owned by other parts of the app (e.g. sensor calibration)
+    if os.path.exists(file_path):
+        with open(file_path, "r") as f:
+            config = {**json.load(f), **config}
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
     with open(file_path, "w") as f:
         json.dump(config, f, indent=4)
@@ -232,6 +238,17 @@ class Settings(QWidget):
         left_layout.addWidget(self.padding_slider)
         controls_layout.addLayout(left_layout)
 
+        # Middle: analysis precision
+        precision_layout = QVBoxLayout()
+        precision_label = QLabel("Precision:")
+        precision_label.setAlignment(Qt.AlignBottom)
+        precision_layout.addWidget(precision_label)
+        self.precision_dropdown = QComboBox()
+        self.precision_dropdown.addItems(["float64", "float32"])
+        self.precision_dropdown.currentIndexChanged.connect(self.update_precision)
+        precision_layout.addWidget(self.precision_dropdown)
+        controls_layout.addLayout(precision_layout)
+
         # Right side: Stylesheet selection dropdown
         right_layout = QVBoxLayout()
         lbl = QLabel("Select Stylesheet:")
@@ -305,6 +322,13 @@ class Settings(QWidget):
         self.rdu_edit.setFixedWidth(100)
         content_layout.addWidget(self.rdu_edit, 4, 1)
 
+        # Sensor calibration from a recording that contains a still period
+        self.misalignment_checkbox = QCheckBox("Correct Misalignment")
+        content_layout.addWidget(self.misalignment_checkbox, 5, 0, 1, 2)
+        self.calibrate_file_button = QPushButton("Calibrate From File")
+        self.calibrate_file_button.clicked.connect(self.calibrate_from_file)
+        content_layout.addWidget(self.calibrate_file_button, 6, 0, 1, 2)
+
         # Set the content widget inside the scroll area
         scroll_area.setWidget(content_widget)
         main_layout.addWidget(scroll_area, 0, 3, 5, 1)  # Placed in the rightmost column
@@ -340,6 +364,10 @@ class Settings(QWidget):
         if self.plot_fft:
             self.plot_fft.update_padding_factor(pf)
 
+    def update_precision(self):
+        if self.plot_fft:
+            self.plot_fft.update_precision(self.precision_dropdown.currentText())
+
     def apply_stylesheet(self, style):
         load_stylesheet(QApplication.instance(), f"style_{style.lower()}")
         if self.plot_fft and self.plot_serial:
@@ -377,6 +405,23 @@ class Settings(QWidget):
             self.rdu_edit.setText(str(self.recording_duration))
         self.update_configuration_file()
 
+    def calibrate_from_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Calibration Recording", "", "CSV Files (*.csv)")
+        if not file_path:
+            return
+        try:
+            calibration = calibrate_from_file(file_path, self.misalignment_checkbox.isChecked())
+        except Exception as e:
+            print(f"Calibration failed: {e}")
+            return
+        if not calibration:
+            print("Calibration failed: no quiescent raw data found.")
+            return
+        save_calibration(calibration)
+        if self.plot_serial:
+            self.plot_serial.serial_reader.calibration.set(calibration)
+            self.plot_serial.serial_reader.high_pass.reset()
+
     def update_configuration_file(self):
         update_config_file(
             self.bolt_widget.bolts,
@@ -0,0 +1,495 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy import fft as sp_fft
+from scipy.signal import butter, get_window, resample_poly, sosfiltfilt
+
+ACCEL_COLUMNS = ("X Acceleration", "Y Acceleration", "Z Acceleration")
+FORCE_COLUMN = "Force"  # Instrumented hammer channel, present only when recorded
+STANDARD_GRAVITY = 9.8124  # m/s² per g; recordings are stored in g
+DEFAULT_FFT_LENGTH = 5096  # Length used by the "fixed" strategy and as the segment size for averaging
+MIN_ANALYSIS_SAMPLES = 16
+# Output rate must be at least this multiple of the highest frequency of interest, which keeps
+# the band of interest inside the flat passband of the anti-alias filter
+DECIMATION_MARGIN = 2.5
+# A uniform grid this many times longer than the recording means the timestamps are mostly
+# gaps (or corrupt), and interpolating across them would invent data
+MAX_RESAMPLE_GROWTH = 4
+
+# Sample dtype -> spectrum dtype. Sensor data carries ~12 bits, so float32 loses nothing measurable.
+PRECISIONS = {
+    "float64": (np.float64, np.complex128),
+    "float32": (np.float32, np.complex64),
+}
+
+# Analysis-length strategies: key -> label shown in the UI
+ANALYSIS_STRATEGIES = {
+    "full": "Full Window",
+    "fixed": "Fixed N",
+    "averaged": "Segment Average",
+}
+
+
+def padded_length(n_samples, padding_factor, strategy="full"):
+    if strategy == "fixed":
+        # Original behaviour: zero-pad to the next power of 2
+        return int(2 ** np.ceil(np.log2(n_samples * padding_factor)))
+    # Any 2/3/5-smooth length is fast for scipy.fft, so avoid the power-of-2 blow-up
+    return sp_fft.next_fast_len(int(np.ceil(n_samples * padding_factor)), real=True)
+
+
+def to_physical_units(data, dtype=None):
+    # Converts the acceleration columns of a loaded recording from g to m/s², once, in place.
+    # With a dtype the converted columns are written in it directly, in the same single pass.
+    for column in ACCEL_COLUMNS:
+        if column in data.columns:
+            data[column] = np.multiply(data[column].to_numpy(), STANDARD_GRAVITY, dtype=dtype)
+    return data
+
+
+def to_recorded_units(data):
+    # Inverse of to_physical_units, for writing data back out in the recording format
+    data = data.copy()
+    for column in ACCEL_COLUMNS:
+        if column in data.columns:
+            data[column] = data[column] / STANDARD_GRAVITY
+    return data
+
+
+def segment_frames(samples, segment_length, overlap=0.5):
+    hop = max(1, int(segment_length * (1 - overlap)))
+    frames = np.lib.stride_tricks.sliding_window_view(samples, segment_length)[::hop]
+    return frames
+
+
+class StreamingWelch:
+    # Welch PSD accumulated block by block. Only the unfinished segment tail and the
+    # running periodogram sum are kept, so memory is O(nperseg) for any recording length.
+    def __init__(self, fs, nperseg=DEFAULT_FFT_LENGTH, overlap=0.5, nfft=None, window="hann", precision="float64"):
+        if not 0 <= overlap < 1:
+            raise ValueError(f"Overlap must be in [0, 1), got {overlap}")
+        self.fs = fs
+        self.nperseg = int(nperseg)
+        self.hop = max(1, self.nperseg - int(self.nperseg * overlap))
+        self.nfft = int(nfft) if nfft else self.nperseg
+        self.dtype = PRECISIONS[precision][0]
+        self.window = get_window(window, self.nperseg).astype(self.dtype)
+        # Density scaling, identical to scipy.signal.welch(scaling="density")
+        self.scale = 1.0 / (fs * np.sum(self.window ** 2))
+        self.reset()
+
+    def reset(self):
+        self._pending = np.empty(0, dtype=self.dtype)
+        # Periodograms are summed in float64 so long averages do not drift
+        self._periodogram_sum = np.zeros(self.nfft // 2 + 1)
+        self.segments = 0
+        self.samples_seen = 0
+
+    def update(self, block):
+        block = np.asarray(block, dtype=self.dtype).ravel()
+        self.samples_seen += len(block)
+        data = np.concatenate((self._pending, block)) if len(self._pending) else block
+        if len(data) < self.nperseg:
+            self._pending = data.copy()
+            return 0
+
+        n_frames = (len(data) - self.nperseg) // self.hop + 1
+        frames = np.lib.stride_tricks.sliding_window_view(data, self.nperseg)[::self.hop][:n_frames]
+        frames = frames - frames.mean(axis=1, keepdims=True)  # Constant detrend per segment
+        spectra = sp_fft.rfft(frames * self.window, n=self.nfft, axis=-1)
+        self._periodogram_sum += np.sum(spectra.real ** 2 + spectra.imag ** 2, axis=0)
+        self.segments += n_frames
+
+        # Keep only the samples that still belong to an unfinished segment
+        self._pending = data[n_frames * self.hop:].copy()
+        return n_frames
+
+    def psd(self):
+        freqs = sp_fft.rfftfreq(self.nfft, d=1 / self.fs)
+        if self.segments == 0:
+            return freqs, np.zeros_like(freqs)
+        psd = self._periodogram_sum * (self.scale / self.segments)
+        # One-sided spectrum: double everything except DC (and Nyquist for even nfft)
+        if self.nfft % 2:
+            psd[1:] *= 2
+        else:
+            psd[1:-1] *= 2
+        return freqs, psd
+
+
+def iter_csv_blocks(file_path, sensor_id=None, axis="X Acceleration", chunksize=200000):
+    # Yields (time in µs, samples) for one sensor/axis without loading the whole file
+    columns = ["Time [microseconds]", "Accelerometer ID", axis]
+    for chunk in pd.read_csv(file_path, usecols=columns, chunksize=chunksize):
+        if sensor_id not in (None, ""):
+            chunk = chunk[chunk["Accelerometer ID"].astype(str) == str(sensor_id)]
+        if not chunk.empty:
+            yield chunk["Time [microseconds]"].to_numpy(), chunk[axis].to_numpy()
+
+
+def stream_psd_from_csv(file_path, sensor_id, axis, nperseg=DEFAULT_FFT_LENGTH, overlap=0.5, padding_factor=1,
+                        chunksize=200000, precision="float64"):
+    accumulator = None
+    for time_us, samples in iter_csv_blocks(file_path, sensor_id, axis, chunksize):
+        if accumulator is None:
+            if len(time_us) < 2:
+                continue
+            dt = np.median(np.diff(time_us)) * 1e-6
+            if dt <= 0:
+                raise ValueError("Invalid time steps in first block.")
+            accumulator = StreamingWelch(1 / dt, nperseg, overlap, nfft=padded_length(nperseg, padding_factor),
+                                         precision=precision)
+        accumulator.update(samples)
+    if accumulator is None:
+        raise ValueError(f"No samples found for sensor {sensor_id} in {file_path}.")
+    return accumulator
+
+
+def decimation_factor(fs, max_frequency):
+    if not max_frequency or max_frequency <= 0:
+        return 1
+    return max(1, int(fs // (DECIMATION_MARGIN * max_frequency)))
+
+
+def decimate(samples, fs, max_frequency):
+    # Zero-phase polyphase anti-alias filter + downsample (resample_poly compensates the FIR delay)
+    factor = decimation_factor(fs, max_frequency)
+    if factor == 1 or len(samples) < MIN_ANALYSIS_SAMPLES * factor:
+        return samples, fs, 1
+    decimated = resample_poly(samples, 1, factor)
+    return decimated.astype(samples.dtype, copy=False), fs / factor, factor
+
+
+def estimate_sample_period(time_values):
+    # Robust fit of time = offset + period * n. Each sample's index n comes from the median
+    # step, so dropouts keep their true position, then jittered or late stamps are rejected
+    # by a MAD test before the final least-squares fit.
+    time_values = np.asarray(time_values, dtype=np.float64)
+    steps = np.diff(time_values)
+    steps = steps[steps > 0]
+    if len(steps) == 0:
+        raise ValueError("Cannot estimate sample rate from constant timestamps.")
+    index = np.round((time_values - time_values[0]) / np.median(steps))
+    keep = np.ones(len(time_values), dtype=bool)
+    for _ in range(3):
+        n, t = index[keep], time_values[keep]
+        n_mean, t_mean = n.mean(), t.mean()
+        n_var = np.sum((n - n_mean) ** 2)
+        if n_var == 0:
+            break
+        period = np.sum((n - n_mean) * (t - t_mean)) / n_var
+        offset = t_mean - period * n_mean
+        residuals = time_values - (offset + period * index)
+        mad = 1.4826 * np.median(np.abs(residuals[keep] - np.median(residuals[keep])))
+        new_keep = np.abs(residuals) <= max(3 * mad, 1e-9 * period)
+        if new_keep.sum() < 2 or np.array_equal(new_keep, keep):
+            break
+        keep = new_keep
+    return period, offset
+
+
+def resample_uniform(time_values, values):
+    # Interpolates every column of `values` onto one uniform grid at the estimated true rate
+    period, offset = estimate_sample_period(time_values)
+    n_samples = int(np.floor((time_values[-1] - offset) / period)) + 1
+    if n_samples > MAX_RESAMPLE_GROWTH * len(time_values):
+        raise ValueError(f"Timestamps span {n_samples} sample periods for only {len(time_values)} samples.")
+    grid = offset + period * np.arange(max(n_samples, 0))
+    grid = grid[grid >= time_values[0]]
+    values = np.asarray(values)
+    resampled = np.empty((len(grid), values.shape[1]), dtype=values.dtype)
+    for column in range(values.shape[1]):
+        resampled[:, column] = np.interp(grid, time_values, values[:, column])
+    return grid, resampled, period
+
+
+def analysis_info(strategy, precision, samples_used, segments, segment_length, fft_length, dt, start,
+                  transforms=None, decimation=1, extra_flops=0):
+    # Summary shown with every spectrum. Resolution is set by the segment duration, bin spacing
+    # by the padded length. Cost is ~5 N log2 N per real FFT, one per segment unless
+    # `transforms` says otherwise, plus any `extra_flops`; elapsed time counts from `start`.
+    transforms = segments if transforms is None else transforms
+    return {
+        'strategy': strategy,
+        'precision': precision,
+        'decimation': decimation,
+        'samples_used': samples_used,
+        'segments': segments,
+        'fft_length': fft_length,
+        'resolution_hz': 1 / (dt * segment_length),
+        'bin_spacing_hz': 1 / (dt * fft_length),
+        'cost_flops': int(5 * transforms * fft_length * np.log2(max(fft_length, 2))) + extra_flops,
+        'elapsed_ms': (time.perf_counter() - start) * 1e3,
+    }
+
+
+def select_analysis_samples(accel_data, strategy, fixed_length=DEFAULT_FFT_LENGTH):
+    # Returns the samples to analyse and the length of a single analysis segment
+    if strategy == "fixed":
+        samples = accel_data[:fixed_length]
+        return samples, fixed_length
+    if strategy == "averaged":
+        return accel_data, min(fixed_length, len(accel_data))
+    if strategy == "full":
+        return accel_data, len(accel_data)
+    raise ValueError(f"Unknown analysis strategy: {strategy}")
+
+
+def compute_spectrum(accel_data, dt, padding_factor, plot_mode="FFT", strategy="full",
+                     fixed_length=DEFAULT_FFT_LENGTH, precision="float64", max_frequency=None):
+    start = time.perf_counter()
+    dtype = PRECISIONS[precision][0]
+    accel_data = np.asarray(accel_data, dtype=dtype)
+    accel_data, fs, decimation = decimate(accel_data, 1 / dt, max_frequency)
+    dt = 1 / fs
+    samples, segment_length = select_analysis_samples(accel_data, strategy, fixed_length)
+
+    if plot_mode == "FFT":
+        fft_length = padded_length(segment_length, padding_factor, strategy)
+        if strategy == "averaged":
+            frames = segment_frames(samples, segment_length)
+        else:
+            frames = samples[np.newaxis, :]
+        # Short selections are windowed over their own length and zero-padded
+        segment_length = frames.shape[-1]
+        window = np.hanning(frames.shape[-1]).astype(dtype)
+        spectra = sp_fft.rfft(frames * window, n=fft_length, axis=-1)
+        positive_magnitudes = np.abs(spectra).mean(axis=0)
+        positive_freqs = sp_fft.rfftfreq(fft_length, d=dt).astype(dtype)
+        segments = frames.shape[0]
+    elif plot_mode == "PSD":
+        # Welch averaging; "full"/"fixed" keep the original half-length segments
+        nperseg = segment_length if strategy == "averaged" else max(256, len(samples) // 2)
+        nperseg = min(nperseg, len(samples))
+        fft_length = padded_length(nperseg, padding_factor)
+        accumulator = StreamingWelch(fs, nperseg, overlap=0.5, nfft=fft_length, precision=precision)
+        accumulator.update(samples)
+        positive_freqs, psd = accumulator.psd()
+        # Convert PSD (power/Hz) to amplitude spectral density (ASD)
+        positive_freqs = positive_freqs.astype(dtype)
+        positive_magnitudes = np.sqrt(psd).astype(dtype)
+        segments = accumulator.segments
+        segment_length = nperseg
+    else:
+        raise ValueError(f"Unknown plot mode: {plot_mode}")
+
+    info = analysis_info(strategy, precision, len(samples), segments, segment_length, fft_length, dt, start,
+                         decimation=decimation)
+    return positive_freqs, positive_magnitudes, info
+
+
+class SegmentSpectra:
+    # "averaged" FFT spectra of one channel. Interior segments sit on a fixed grid (segment k
+    # starts at sample k * hop of the channel) instead of a grid anchored at the window start,
+    # and one more segment is anchored at each window edge, so every sample of the window is
+    # analysed. Each segment's magnitude spectrum is computed once and kept by its start
+    # sample: windows that differ by a few samples only transform their edge segments. The
+    # least recently used are dropped first.
+    MAX_SEGMENTS = 128
+    CHUNK_SEGMENTS = 32  # Segments transformed per rfft call
+
+    def __init__(self, segment_length, padding_factor, precision="float64", overlap=0.5):
+        self.segment_length = segment_length
+        self.fft_length = padded_length(segment_length, padding_factor, "averaged")
+        self.precision = precision
+        self.hop = max(1, int(segment_length * (1 - overlap)))
+        self.window = np.hanning(segment_length).astype(PRECISIONS[precision][0])
+        self.spectra = OrderedDict()  # Segment start sample -> magnitude spectrum
+
+    def segment_starts(self, start, stop):
+        # The grid segments inside [start, stop) plus the two edge-anchored ones
+        last = stop - self.segment_length
+        if last < start:
+            return []
+        first_grid = -(-start // self.hop) * self.hop
+        return sorted({start, last}.union(range(first_grid, last + 1, self.hop)))
+
+    def spectrum(self, channel, start, stop, dt):
+        # Same result layout as compute_spectrum for channel[start:stop]; None when the window
+        # is shorter than one segment
+        start_time = time.perf_counter()
+        positions = self.segment_starts(start, stop)
+        if not positions:
+            return None
+        total = np.zeros(self.fft_length // 2 + 1, dtype=self.window.dtype)
+        missing = []
+        for position in positions:
+            if position in self.spectra:
+                total += self.spectra[position]
+                self.spectra.move_to_end(position)
+            else:
+                missing.append(position)
+        # New segments in chunks; storing each evicts the oldest beyond MAX_SEGMENTS
+        for chunk_start in range(0, len(missing), self.CHUNK_SEGMENTS):
+            chunk = missing[chunk_start:chunk_start + self.CHUNK_SEGMENTS]
+            rows = np.asarray(chunk)[:, np.newaxis] + np.arange(self.segment_length)
+            frames = np.asarray(channel, dtype=self.window.dtype)[rows]
+            frames -= frames.mean(axis=1, keepdims=True)
+            magnitudes = np.abs(sp_fft.rfft(frames * self.window, n=self.fft_length, axis=-1))
+            total += magnitudes.sum(axis=0)
+            for position, magnitude in zip(chunk, magnitudes):
+                self.spectra[position] = magnitude
+                if len(self.spectra) > self.MAX_SEGMENTS:
+                    self.spectra.popitem(last=False)
+        info = analysis_info("averaged", self.precision, positions[-1] + self.segment_length - positions[0],
+                             len(positions), self.segment_length, self.fft_length, dt, start_time,
+                             transforms=len(missing))
+        return sp_fft.rfftfreq(self.fft_length, d=dt).astype(self.window.dtype), total / len(positions), info
+
+
+def format_analysis_info(info):
+    return ("{}: N={} x{} | FFT={}\nΔf: {:.3f} Hz | ↓{} | {:.1f} ms".format(
+        ANALYSIS_STRATEGIES.get(info['strategy'], info['strategy']),
+        info['samples_used'], info['segments'], info['fft_length'],
+        info['resolution_hz'], info.get('decimation', 1), info['elapsed_ms']))
+
+
+def stack_spectra(spectra):
+    # Pads ragged (freqs, magnitudes) pairs into 2-D arrays plus a validity mask
+    lengths = np.array([len(freqs) for freqs, _ in spectra], dtype=int)
+    n_bins = lengths.max() if len(lengths) else 0
+    dtype = np.result_type(*[mags.dtype for _, mags in spectra]) if spectra else np.float64
+    freqs_stack = np.zeros((len(spectra), n_bins), dtype=dtype)
+    mags_stack = np.zeros((len(spectra), n_bins), dtype=dtype)
+    for row, (freqs, mags) in enumerate(spectra):
+        freqs_stack[row, :len(freqs)] = freqs
+        mags_stack[row, :len(mags)] = mags
+        # Repeat the last value so padding does not drag down the rolling noise floor
+        mags_stack[row, len(mags):] = mags[-1] if len(mags) else 0
+    valid = np.arange(n_bins) < lengths[:, np.newaxis]
+    return freqs_stack, mags_stack, valid
+
+
+def rolling_median(values, window, step=None):
+    # Median over a sliding window along the last axis, evaluated every `step` bins and
+    # linearly interpolated in between. Exact when step == 1.
+    window = max(3, int(window) | 1)
+    step = max(1, int(step if step else window // 2))
+    n_bins = values.shape[-1]
+    half = window // 2
+    padded = np.pad(values, ((0, 0), (half, half)), mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=-1)[:, ::step]
+    # Odd window, so the median is the middle order statistic; partition beats np.median
+    medians = np.partition(windows, half, axis=-1)[..., half]
+    if step == 1:
+        return medians
+    position = np.arange(n_bins) / step
+    left = np.minimum(position.astype(int), medians.shape[-1] - 1)
+    right = np.minimum(left + 1, medians.shape[-1] - 1)
+    fraction = (position - left).astype(values.dtype)
+    return medians[:, left] * (1 - fraction) + medians[:, right] * fraction
+
+
+def detect_peaks_batch(spectra, height=None, min_snr=3.0, min_prominence=0.0, noise_window=None):
+    # Peak picking for many spectra at once. Each spectrum gets its own noise floor from a
+    # rolling median; peaks must be local maxima above `height`, `min_snr` x floor and
+    # `min_prominence` above the floor. Returns one peak table (dict of arrays) per spectrum.
+    if not spectra:
+        return []
+    freqs_stack, mags_stack, valid = stack_spectra(spectra)
+    n_bins = mags_stack.shape[1]
+    if n_bins < 3:
+        return [_empty_peak_table(mags_stack.dtype) for _ in spectra]
+
+    if noise_window is None:
+        noise_window = max(31, n_bins // 200)
+    noise_floor = rolling_median(mags_stack, noise_window)
+    floor = np.maximum(noise_floor, np.finfo(mags_stack.dtype).tiny)
+
+    centre = mags_stack[:, 1:-1]
+    is_peak = np.zeros_like(valid)
+    is_peak[:, 1:-1] = (centre > mags_stack[:, :-2]) & (centre >= mags_stack[:, 2:])
+    # The last valid bin of a shorter spectrum borders padding, so it cannot be a peak
+    is_peak[:, 1:-1] &= valid[:, 2:]
+    snr = mags_stack / floor
+    if height is not None:
+        is_peak &= mags_stack >= height
+    if min_snr:
+        is_peak &= snr >= min_snr
+    if min_prominence:
+        is_peak &= (mags_stack - noise_floor) >= min_prominence
+
+    rows, cols = np.nonzero(is_peak)
+    damping = half_power_damping(freqs_stack, mags_stack, valid, rows, cols)
+    splits = np.cumsum(np.bincount(rows, minlength=len(spectra)))[:-1]
+    tables = []
+    for row_index, (row_cols, row_damping) in enumerate(zip(np.split(cols, splits), np.split(damping, splits))):
+        tables.append({
+            'indices': row_cols,
+            'frequencies': freqs_stack[row_index, row_cols],
+            'magnitudes': mags_stack[row_index, row_cols],
+            'snr': snr[row_index, row_cols],
+            'noise_floor': noise_floor[row_index, row_cols],
+            'damping_half_power': row_damping,
+            'damping_log_decrement': np.full(len(row_cols), np.nan, dtype=mags_stack.dtype),
+        })
+    return tables
+
+
+def half_power_damping(freqs_stack, mags_stack, valid, rows, cols):
+    # Damping ratio of every peak (rows[k], cols[k]) from its -3 dB bandwidth,
+    # zeta = (f2 - f1) / (2 fn). All peaks walk outwards together until their magnitude
+    # drops below peak / sqrt(2); crossings are interpolated linearly between bins. Peaks
+    # whose half-power point lies outside the valid band get NaN. A Hann window over a
+    # short transient narrows the peak, so for impacts the log decrement is the reference.
+    level = mags_stack[rows, cols] / np.sqrt(2)
+    edges = []
+    for direction in (-1, 1):
+        position = cols.copy()
+        crossed = np.zeros(len(cols), dtype=bool)
+        active = np.ones(len(cols), dtype=bool)
+        while active.any():
+            step = position[active] + direction
+            inside = (step >= 0) & (step < mags_stack.shape[1])
+            inside[inside] &= valid[rows[active][inside], step[inside]]
+            index = np.flatnonzero(active)
+            active[index[~inside]] = False
+            index, step = index[inside], step[inside]
+            position[index] = step
+            below = mags_stack[rows[index], step] < level[index]
+            crossed[index[below]] = True
+            active[index[below]] = False
+        # Interpolate between the first bin below the level and its neighbour towards the peak
+        inner = np.clip(position - direction, 0, mags_stack.shape[1] - 1)
+        m_out, m_in = mags_stack[rows, position], mags_stack[rows, inner]
+        fraction = (level - m_out) / np.where(m_in != m_out, m_in - m_out, 1)
+        edge = freqs_stack[rows, position] + fraction * (freqs_stack[rows, inner] - freqs_stack[rows, position])
+        edges.append(np.where(crossed, edge, np.nan))
+    peak_freqs = freqs_stack[rows, cols]
+    return (edges[1] - edges[0]) / (2 * np.where(peak_freqs > 0, peak_freqs, np.nan))
+
+
+def log_decrement_damping(samples, dt, peak_frequencies, bandwidth=0.1, min_cycles=3, decay_limit=0.1):
+    # Damping ratio of each mode from the free decay of the time signal, without an FFT:
+    # the signal is band-passed around the mode, the per-cycle peak amplitude is taken from
+    # the strongest cycle until it decays to `decay_limit` of it, and the logarithmic
+    # decrement delta is the negative slope of log amplitude per cycle.
+    # zeta = delta / sqrt(4 pi^2 + delta^2)
+    samples = np.asarray(samples, dtype=np.float64)
+    fs = 1 / dt
+    damping = np.full(len(peak_frequencies), np.nan)
+    for k, freq in enumerate(peak_frequencies):
+        low, high = freq * (1 - bandwidth), freq * (1 + bandwidth)
+        period = int(round(fs / freq)) if freq > 0 else 0
+        if period < 2 or high >= fs / 2 or len(samples) < (min_cycles + 1) * period * 2:
+            continue
+        filtered = sosfiltfilt(butter(2, [low, high], btype="bandpass", fs=fs, output="sos"), samples)
+        n_cycles = len(filtered) // period
+        amplitude = np.abs(filtered[:n_cycles * period]).reshape(n_cycles, period).max(axis=1)
+        start = int(np.argmax(amplitude))
+        decayed = np.flatnonzero(amplitude[start:] < decay_limit * amplitude[start])
+        stop = start + (decayed[0] if len(decayed) else n_cycles - start)
+        if stop - start < min_cycles:
+            continue
+        delta = -np.polyfit(np.arange(stop - start), np.log(amplitude[start:stop]), 1)[0]
+        if delta > 0:
+            damping[k] = delta / np.sqrt(4 * np.pi ** 2 + delta ** 2)
+    return damping
+
+
+def _empty_peak_table(dtype):
+    empty = np.array([], dtype=dtype)
+    return {'indices': np.array([], dtype=int), 'frequencies': empty, 'magnitudes': empty,
+            'snr': empty, 'noise_floor': empty, 'damping_half_power': empty, 'damping_log_decrement': empty}
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from signal_processing import to_recorded_units
+
+COMPACT_SUFFIX = ".npz"  # Everything in one multi-array file instead of one CSV per table
+
+
+def nearest_bins(freqs, targets):
+    # Index of the bin closest to each target in a sorted frequency axis; ties go to the lower
+    # bin, like argmin. One searchsorted for all targets.
+    targets = np.asarray(targets, dtype=np.float64)
+    if len(freqs) < 2:
+        return np.zeros(len(targets), dtype=np.intp)
+    idx = np.clip(np.searchsorted(freqs, targets), 1, len(freqs) - 1)
+    idx -= (targets - freqs[idx - 1]) <= (freqs[idx] - targets)
+    return idx
+
+
+def to_db(magnitudes):
+    with np.errstate(divide="ignore"):
+        return 20 * np.log10(magnitudes)
+
+
+def selected_frequency_table(processed_data, peak_tables, selected_freqs):
+    # For every selected frequency and spectrum: the nearest bin, its magnitude and the damping
+    # of the detected peak at that bin (NaN if none). Rows are ordered by selected frequency,
+    # then spectrum.
+    columns = {"Natural Frequency (Hz)": [], "Magnitude (dB)": [], "Damping Ratio (Half-Power)": [],
+               "Damping Ratio (Log Decrement)": [], "Dataset": []}
+    order = []
+    for row, (freq_data, peak_table) in enumerate(zip(processed_data, peak_tables)):
+        freqs, magnitudes = freq_data['positive_freqs'], freq_data['positive_magnitudes']
+        if len(freqs) == 0:
+            continue
+        idx = nearest_bins(freqs, selected_freqs)
+        # Peak indices are sorted, so matching bins to peaks is one searchsorted as well
+        peak_indices = peak_table['indices']
+        position = np.minimum(np.searchsorted(peak_indices, idx), max(len(peak_indices) - 1, 0))
+        is_peak = (peak_indices[position] == idx) if len(peak_indices) else np.zeros(len(idx), dtype=bool)
+        columns["Natural Frequency (Hz)"].append(freqs[idx])
+        columns["Magnitude (dB)"].append(to_db(magnitudes[idx]))
+        for name, key in (("Damping Ratio (Half-Power)", 'damping_half_power'),
+                          ("Damping Ratio (Log Decrement)", 'damping_log_decrement')):
+            damping = peak_table[key][position] if len(peak_indices) else np.full(len(idx), np.nan)
+            columns[name].append(np.where(is_peak, damping, np.nan))
+        columns["Dataset"].append(np.full(len(idx), row + 1))
+        order.append(np.arange(len(idx)))
+    if not order:
+        return pd.DataFrame(columns=list(columns))
+    # Stable sort on the selected-frequency position keeps spectra in order within each one
+    rows = np.argsort(np.concatenate(order), kind="stable")
+    return pd.DataFrame({name: np.concatenate(values)[rows] for name, values in columns.items()})
+
+
+def record_array(data):
+    # One structured record per row; text columns (sensor ids) become fixed-width strings
+    columns = {column: data[column].to_numpy() for column in data.columns}
+    columns = {column: values if np.issubdtype(values.dtype, np.number) else values.astype(str)
+               for column, values in columns.items()}
+    records = np.empty(len(data), dtype=[(column, values.dtype) for column, values in columns.items()])
+    for column, values in columns.items():
+        records[column] = values
+    return records
+
+
+def export_results(file_base_path, trimmed_data, processed_data, peak_tables, selected_freqs,
+                   compact=False):
+    # Writes the trimmed samples, every spectrum in dB and the selected-frequency table. Runs
+    # off the GUI thread, so it only reports through print and returns the paths written.
+    # trimmed_data holds (dataset number, DataFrame) pairs; empty frames are skipped.
+    written = []
+    arrays = {}
+    for number, data in trimmed_data:
+        if data.empty:
+            print(f"No data in range for Dataset {number}.")
+            continue
+        data = to_recorded_units(data)
+        if compact:
+            arrays[f"dataset_{number}_trimmed_data"] = record_array(data)
+        else:
+            path = f"{file_base_path}_Dataset_{number}_trimmed_data.csv"
+            data.to_csv(path, index=False)
+            written.append(path)
+            print(f"Dataset {number} trimmed data exported to {path}.")
+
+    if not processed_data:
+        print("Frequency data unavailable for export.")
+    for i, freq_data in enumerate(processed_data):
+        freqs, magnitudes_db = freq_data['positive_freqs'], to_db(freq_data['positive_magnitudes'])
+        if compact:
+            arrays[f"dataset_{i + 1}_frequency"] = freqs
+            arrays[f"dataset_{i + 1}_magnitude_db"] = magnitudes_db
+        else:
+            path = f"{file_base_path}_Dataset_{i + 1}_frequency_magnitude.csv"
+            pd.DataFrame({"Frequency (Hz)": freqs, "Magnitude (dB)": magnitudes_db}).to_csv(path, index=False)
+            written.append(path)
+            print(f"Dataset {i + 1} frequency data exported to {path}.")
+
+    if selected_freqs:
+        table = selected_frequency_table(processed_data, peak_tables, selected_freqs)
+        if table.empty:
+            print("No matching natural frequencies found for export.")
+        elif compact:
+            arrays["selected_natural_frequencies"] = record_array(table)
+        else:
+            path = f"{file_base_path}_selected_natural_frequencies.csv"
+            table.drop(columns="Dataset").to_csv(path, index=False)
+            written.append(path)
+            print(f"Selected frequencies exported to {path}.")
+    else:
+        print("No natural frequencies selected for export.")
+
+    if compact and arrays:
+        path = file_base_path if file_base_path.endswith(COMPACT_SUFFIX) else file_base_path + COMPACT_SUFFIX
+        np.savez(path, **arrays)
+        written.append(path)
+        print(f"{len(arrays)} arrays exported to {path}.")
+    return written
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class Cancelled(Exception):
+    # Raised inside a job once a newer request has superseded it
+    pass
+
+
+class WorkerSignals(QObject):
+    finished = Signal(int, object)
+    failed = Signal(int, str)
+    done = Signal(int)  # Always emitted last, also after cancellation
+
+
+class Worker(QRunnable):
+    def __init__(self, request_id, fn, *args, **kwargs):
+        super().__init__()
+        self.request_id = request_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        # Owned by the runner, which may still look it up in the pool after run() returns
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+            self.signals.finished.emit(self.request_id, result)
+        except Cancelled:
+            pass
+        except Exception as e:
+            self.signals.failed.emit(self.request_id, str(e))
+        self.signals.done.emit(self.request_id)
+
+
+class LatestWinsRunner(QObject):
+    # Runs jobs on a private single-thread pool. Submitting a job drops every queued one,
+    # a running job can poll `cancelled()` between stages, and only the newest job's result
+    # reaches the callback (on the thread that owns the runner, i.e. the GUI thread).
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.latest = 0
+        self.callbacks = {}
+        self.workers = {}  # Kept alive until their signals have been delivered
+
+    def submit(self, fn, *args, callback=None, **kwargs):
+        self.cancel()
+        request_id = self.latest
+        self.callbacks = {request_id: callback}
+        worker = Worker(request_id, fn, *args, cancelled=lambda: request_id != self.latest, **kwargs)
+        worker.signals.finished.connect(self._finished)
+        worker.signals.failed.connect(self._failed)
+        worker.signals.done.connect(self._done)
+        self.workers[request_id] = worker
+        self.pool.start(worker)
+        return request_id
+
+    def cancel(self):
+        # Invalidates whatever is queued or running; queued jobs never start. A job the pool
+        # has already picked up cannot be taken back, so it stays referenced until it is done.
+        self.latest += 1
+        self.callbacks = {}
+        for request_id, worker in list(self.workers.items()):
+            if self.pool.tryTake(worker):
+                del self.workers[request_id]
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _finished(self, request_id, result):
+        callback = self.callbacks.pop(request_id, None)
+        if request_id == self.latest and callback is not None:
+            callback(result)
+
+    def _failed(self, request_id, message):
+        if request_id == self.latest:
+            print(f"Background computation failed: {message}")
+
+    def _done(self, request_id):
+        self.workers.pop(request_id, None)
+
+
+class QueuedRunner(QObject):
+    # Runs every submitted job to completion, one at a time and in submission order, on a
+    # private thread. Each job's result reaches its own callback on the owner's thread.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.next_id = 0
+        self.callbacks = {}
+        self.workers = {}  # Kept alive until their signals have been delivered
+
+    def submit(self, fn, *args, callback=None, **kwargs):
+        request_id = self.next_id
+        self.next_id += 1
+        self.callbacks[request_id] = callback
+        worker = Worker(request_id, fn, *args, **kwargs)
+        worker.signals.finished.connect(self._finished)
+        worker.signals.failed.connect(self._failed)
+        worker.signals.done.connect(self._done)
+        self.workers[request_id] = worker
+        self.pool.start(worker)
+        return request_id
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _finished(self, request_id, result):
+        callback = self.callbacks.pop(request_id, None)
+        if callback is not None:
+            callback(result)
+
+    def _failed(self, request_id, message):
+        self.callbacks.pop(request_id, None)
+        print(f"Background job failed: {message}")
+
+    def _done(self, request_id):
+        self.workers.pop(request_id, None)
+
+
+class ProcessPoolRunner(QObject):
+    # Runs independent jobs in worker processes and delivers each result on the thread that
+    # owns the runner as soon as that job finishes. Starting a new batch cancels the jobs of
+    # the previous one that have not started and ignores the rest of its results.
+    result_ready = Signal(int, object)  # job index, result
+    job_failed = Signal(int, str)
+    batch_finished = Signal()
+    _completed = Signal(int, int, object, str)  # From the executor's thread to the owner's
+
+    def __init__(self, parent=None, max_workers=None):
+        super().__init__(parent)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None  # Created on first use; worker processes are reused across batches
+        self.batch = 0
+        self.futures = []
+        self.remaining = 0
+        self._completed.connect(self._deliver)
+
+    def map(self, fn, jobs):
+        # jobs is a list of argument tuples; fn must be importable by the worker processes
+        self.cancel()
+        self.remaining = len(jobs)
+        try:
+            self.futures = [self._executor().submit(fn, *args) for args in jobs]
+        except BrokenProcessPool:
+            # A worker died in an earlier batch; start over with a fresh pool
+            self.executor = None
+            self.futures = [self._executor().submit(fn, *args) for args in jobs]
+        for index, future in enumerate(self.futures):
+            future.add_done_callback(partial(self._future_done, self.batch, index))
+
+    def cancel(self):
+        # Jobs that have not started are dropped and results still to come are ignored
+        self.batch += 1
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.remaining = 0
+
+    def _executor(self):
+        if self.executor is None:
+            # Spawned rather than forked: the parent is a multi-threaded Qt process
+            self.executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    def _future_done(self, batch, index, future):
+        try:
+            self._completed.emit(batch, index, future.result(), "")
+        except CancelledError:
+            pass
+        except Exception as e:
+            self._completed.emit(batch, index, None, str(e) or type(e).__name__)
+
+    def _deliver(self, batch, index, result, error):
+        if batch != self.batch:
+            return
+        if error:
+            self.job_failed.emit(index, error)
+        else:
+            self.result_ready.emit(index, result)
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.futures = []
+            self.batch_finished.emit()